@@ -1,18 +1,72 @@
 import happybase
+import math
+import os
 import random
-from typing import List, Dict, Any
-from datetime import datetime
+import sys
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from datetime import datetime, timedelta
 from colorama import Fore, Style, init
 import json
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from f1_codec import FINGERPRINT_QUALIFIER
+from f1_pyramid import PYRAMID_LEVELS, bucket_start, pick_level
+
 # Initialize colorama for colored output
 init()
 
+# Families sampled by random seeks instead of a full pass in get_driver_data
+TIME_SERIES_FAMILIES = ('car', 'location')
+
+def reservoir_sample(items, k: int, rng=random) -> list:
+    """
+    Uniform sample of k items from a stream of unknown length (Algorithm L).
+
+    Memory is O(k), and random numbers are only drawn for items that enter the reservoir.
+    """
+    if k <= 0:
+        return []
+    iterator = iter(items)
+    reservoir = []
+    for item in iterator:
+        reservoir.append(item)
+        if len(reservoir) >= k:
+            break
+    if len(reservoir) < k:
+        return reservoir
+    
+    def uniform() -> float:
+        # In (0, 1), so the logarithms below stay finite
+        return rng.random() or 1e-12
+    
+    weight = math.exp(math.log(uniform()) / k)
+    next_index = k + int(math.log(uniform()) / math.log(1 - weight))
+    for position, item in enumerate(iterator, start=k):
+        if position == next_index:
+            reservoir[rng.randrange(k)] = item
+            weight *= math.exp(math.log(uniform()) / k)
+            next_index += int(math.log(uniform()) / math.log(1 - weight)) + 1
+    return reservoir
+
+def prefix_stop(prefix: bytes) -> Optional[bytes]:
+    """Smallest row key greater than every key starting with prefix."""
+    stripped = prefix.rstrip(b'\xff')
+    if not stripped:
+        return None
+    return stripped[:-1] + bytes([stripped[-1] + 1])
+
 class F1DataReader:
-    def __init__(self, host='localhost', port=9090):
-        """Initialize the F1 data reader with HBase connection parameters."""
-        self.connection = happybase.Connection(host=host, port=port)
+    def __init__(self, host='localhost', port=9090, connection=None):
+        """
+        Initialize the F1 data reader with HBase connection parameters.
+        
+        An existing connection (e.g. one checked out of a happybase.ConnectionPool)
+        can be passed instead; the reader then never opens its own.
+        """
+        self.connection = connection or happybase.Connection(host=host, port=port)
         self.table = self.connection.table('f1_data')
+        self.summary_table = self.connection.table('f1_summary')
+        self.index_table = self.connection.table('f1_index')
         
     def print_section_header(self, title: str):
         """Print a formatted section header."""
@@ -21,11 +75,13 @@ class F1DataReader:
         print(f"{'='*80}{Style.RESET_ALL}\n")
     
     def format_data(self, data: Dict[str, bytes]) -> Dict[str, Any]:
-        """Format binary HBase data into a readable dictionary."""
-        return {
-            k.decode().split(':')[1]: v.decode()
-            for k, v in data.items()
-        }
+        """Format binary HBase data into a readable dictionary, without the ingester's fingerprints."""
+        formatted = {}
+        for k, v in data.items():
+            qualifier = k.decode().split(':')[1]
+            if qualifier != FINGERPRINT_QUALIFIER:
+                formatted[qualifier] = v.decode()
+        return formatted
     
     def print_formatted_data(self, data: Dict[str, Any], indent: int = 2):
         """Print dictionary data in a formatted way."""
@@ -55,38 +111,272 @@ class F1DataReader:
             self.print_formatted_data(session_data)
             return {'session_key': session_data['session_key']}
             
+    def get_session_index(self, session_key: str) -> Optional[Dict[str, Any]]:
+        """Look up a session's row-key prefix, drivers and family ranges in f1_index."""
+        data = self.index_table.row(str(session_key).encode(),
+                                    columns=['session', 'drivers', 'ranges'])
+        if not data:
+            return None
+        entry = {'drivers': {}, 'ranges': {}}
+        for column, value in data.items():
+            family, qualifier = column.decode().split(':', 1)
+            # Every family of the index row also holds the ingester's fingerprint
+            if qualifier == FINGERPRINT_QUALIFIER:
+                continue
+            if family == 'session':
+                entry[qualifier] = value.decode()
+            elif family == 'drivers':
+                entry['drivers'][qualifier] = json.loads(value.decode())
+            elif family == 'ranges':
+                entry['ranges'][qualifier] = value
+        return entry
+    
+    def session_scan_bounds(self, session_key: str, column_family: str,
+                            driver_number: Optional[int] = None) -> Optional[Dict[str, bytes]]:
+        """Scan arguments bounding a session (and driver) to its own rows, None without an index entry."""
+        index = self.get_session_index(session_key)
+        if index is None:
+            return None
+        if driver_number is not None:
+            return {'row_prefix': f"{index['prefix']}#{driver_number}#".encode()}
+        first = index['ranges'].get(f"{column_family}_first")
+        last = index['ranges'].get(f"{column_family}_last")
+        if first is None or last is None:
+            return {'row_prefix': f"{index['prefix']}#".encode()}
+        # row_stop is exclusive, the smallest key after `last` is last + 0x00
+        return {'row_start': first, 'row_stop': last + b'\x00'}
+    
+    def iter_session_rows(self, session_key: str, column_family: str,
+                          driver_number: Optional[int] = None) -> Iterator[Tuple[bytes, Dict[bytes, bytes]]]:
+        """Iterate a column family's rows for a session, optionally for one driver."""
+        bounds = self.session_scan_bounds(session_key, column_family, driver_number)
+        if bounds is not None:
+            yield from self.table.scan(columns=[column_family], **bounds)
+            return
+        
+        # No index entry: full scan, matching key components exactly
+        for key, data in self.table.scan(columns=[column_family]):
+            parts = key.decode().split('#')
+            if len(parts) > 2 and parts[2] == str(session_key) and (
+                    driver_number is None or (len(parts) > 3 and parts[3] == str(driver_number))):
+                yield key, data
+            
+    def get_lap_windows(self, session_key: str, lap_start: int, lap_end: Optional[int] = None,
+                        driver_number: Optional[int] = None,
+                        index: Optional[Dict[str, Any]] = None) -> Dict[str, Tuple[str, str]]:
+        """
+        Time window [start of lap_start, end of lap_end) per driver, from the f1_index lap index.
+        
+        Only the two boundary laps of each driver are read, in a single row get.
+        Drivers missing either boundary lap are left out.
+        """
+        index = index or self.get_session_index(session_key)
+        if index is None:
+            return {}
+        lap_end = lap_start if lap_end is None else lap_end
+        drivers = [str(driver_number)] if driver_number is not None else list(index['drivers'])
+        columns = [f"laps:{driver}#{lap}" for driver in drivers for lap in {lap_start, lap_end}]
+        data = self.index_table.row(str(session_key).encode(), columns=columns) if columns else {}
+        
+        windows = {}
+        for driver in drivers:
+            first = data.get(f"laps:{driver}#{lap_start}".encode())
+            last = data.get(f"laps:{driver}#{lap_end}".encode())
+            if first is not None and last is not None:
+                windows[driver] = (json.loads(first)[0], json.loads(last)[1])
+        return windows
+    
+    def iter_lap_rows(self, session_key: str, column_family: str, lap_start: int,
+                      lap_end: Optional[int] = None,
+                      driver_number: Optional[int] = None) -> Iterator[Tuple[bytes, Dict[bytes, bytes]]]:
+        """
+        Iterate a time-series family's rows recorded during laps lap_start..lap_end.
+        
+        Each driver's window becomes one bounded scan from
+        `{prefix}#{driver}#{date_start}` to `{prefix}#{driver}#{date_end}`.
+        """
+        index = self.get_session_index(session_key)
+        if index is None:
+            return
+        windows = self.get_lap_windows(session_key, lap_start, lap_end, driver_number, index)
+        for driver, (date_start, date_end) in sorted(windows.items()):
+            prefix = f"{index['prefix']}#{driver}#"
+            yield from self.table.scan(row_start=(prefix + date_start).encode(),
+                                       row_stop=(prefix + date_end).encode(),
+                                       columns=[column_family])
+    
+    def fetch_lap_records(self, session_key: str, column_family: str, lap_start: int,
+                          lap_end: Optional[int] = None,
+                          driver_number: Optional[int] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """Records of a lap range as (row key, formatted record) pairs, see iter_lap_rows."""
+        return [(key.decode(), self.format_data(data))
+                for key, data in self.iter_lap_rows(session_key, column_family, lap_start,
+                                                    lap_end, driver_number)]
+            
+    def fetch_telemetry(self, session_key: str, driver_number: int, date_start: Optional[str] = None,
+                        date_end: Optional[str] = None, resolution: Optional[float] = None,
+                        column_family: str = 'car') -> Tuple[str, List[Tuple[str, Dict[str, Any]]]]:
+        """
+        Telemetry of a driver between two instants, read at the coarsest level that fits.
+        
+        resolution is the largest acceptable spacing between points, in seconds.
+        The 10 s or 1 s pyramid buckets (count/mean/min/max per car and location
+        channel) are used when they are fine enough, raw `column_family` samples
+        otherwise. Returns the family read and (row key, record) pairs.
+        """
+        family = pick_level(resolution) or column_family
+        index = self.get_session_index(session_key)
+        if index is None:
+            return family, []
+        prefix = f"{index['prefix']}#{driver_number}#"
+        
+        row_start = prefix.encode()
+        if date_start:
+            if family != column_family:
+                # Start from the bucket containing date_start
+                date_start = bucket_start(date_start, dict(PYRAMID_LEVELS)[family])
+            row_start = (prefix + date_start).encode()
+        row_stop = (prefix + date_end).encode() if date_end else prefix_stop(prefix.encode())
+        
+        rows = self.table.scan(row_start=row_start, row_stop=row_stop, columns=[family])
+        return family, [(key.decode(), self.format_data(data)) for key, data in rows]
+    
+    def fetch_lap_summaries(self, session_key: str, driver_number: int, lap_start: int,
+                            lap_end: Optional[int] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """Per-lap telemetry buckets (pyramidlap) of laps lap_start..lap_end, read with one multi-row get."""
+        index = self.get_session_index(session_key)
+        if index is None:
+            return []
+        lap_end = lap_start if lap_end is None else lap_end
+        keys = [f"{index['prefix']}#{driver_number}#{lap}".encode()
+                for lap in range(lap_start, lap_end + 1)]
+        return [(key.decode(), self.format_data(data))
+                for key, data in self.table.rows(keys, columns=['pyramidlap'])]
+            
     def get_drivers(self, session_key: str):
         """Retrieve and display driver information for a session."""
         self.print_section_header("Drivers Information")
         
-        for key, data in self.table.scan(columns=['driver']):
-            if session_key in key.decode():
-                driver_data = self.format_data(data)
-                self.print_formatted_data(driver_data)
+        for driver_data in self.fetch_drivers(session_key):
+            self.print_formatted_data(driver_data)
+    
+    def fetch_drivers(self, session_key: str) -> List[Dict[str, Any]]:
+        """Driver records of a session, from f1_index or else the driver rows."""
+        index = self.get_session_index(session_key)
+        if index and index['drivers']:
+            return list(index['drivers'].values())
+        return [self.format_data(data) for _, data in self.iter_session_rows(session_key, 'driver')]
                 
-    def get_random_records(self, session_key: str, column_family: str, count: int = 10):
-        """Retrieve and display random records for a specific column family."""
+    def get_random_records(self, session_key: str, column_family: str, count: int = 10,
+                           driver_number: Optional[int] = None, mode: str = 'reservoir'):
+        """
+        Retrieve and display random records for a specific column family.
+        
+        mode='reservoir' streams the session's rows through a reservoir of `count`
+        records. mode='seek' (time-series families only) jumps to random instants
+        of the session and reads one row per seek, so its cost depends on `count`
+        only.
+        """
         self.print_section_header(f"Random {column_family} Records")
         
-        records = []
-        for key, data in self.table.scan(columns=[column_family]):
-            if session_key in key.decode():
-                records.append((key, data))
+        for key, record in self.fetch_random_records(session_key, column_family, count,
+                                                     driver_number, mode):
+            print(f"\n{Fore.YELLOW}Record Key:{Style.RESET_ALL} {key}")
+            self.print_formatted_data(record)
+    
+    def fetch_random_records(self, session_key: str, column_family: str, count: int = 10,
+                             driver_number: Optional[int] = None,
+                             mode: str = 'reservoir') -> List[Tuple[str, Dict[str, Any]]]:
+        """Sample records as (row key, formatted record) pairs, see get_random_records."""
+        selected = None
+        if mode == 'seek':
+            selected = self.seek_random_records(session_key, column_family, count, driver_number)
+        if selected is None:
+            selected = reservoir_sample(
+                self.iter_session_rows(session_key, column_family, driver_number), count)
+        return [(key.decode(), self.format_data(data)) for key, data in selected]
+    
+    def seek_random_records(self, session_key: str, column_family: str, count: int,
+                            driver_number: Optional[int] = None,
+                            max_attempts: Optional[int] = None) -> Optional[List[Tuple[bytes, Dict]]]:
+        """
+        Sample time-series rows with random single-row seeks.
+        
+        Each seek picks a driver and a uniform instant of the session, then reads
+        the first row at or after `{prefix}#{driver}#{instant}`. Returns None when
+        the session has no index entry with its time window.
+        """
+        index = self.get_session_index(session_key)
+        if index is None or not index.get('date_start') or not index.get('date_end'):
+            return None
+        drivers = [str(driver_number)] if driver_number is not None else list(index['drivers'])
+        if not drivers:
+            return None
+        
+        session_start = datetime.fromisoformat(index['date_start'].replace('Z', '+00:00'))
+        session_end = datetime.fromisoformat(index['date_end'].replace('Z', '+00:00'))
+        span = (session_end - session_start).total_seconds()
+        
+        sampled: Dict[bytes, Dict[bytes, bytes]] = {}
+        for _ in range(max_attempts or count * 4):
+            if len(sampled) >= count:
+                break
+            prefix = f"{index['prefix']}#{random.choice(drivers)}#".encode()
+            instant = session_start + timedelta(seconds=random.uniform(0, span))
+            hit = next(iter(self.table.scan(row_start=prefix + instant.isoformat().encode(),
+                                            row_stop=prefix_stop(prefix),
+                                            columns=[column_family], limit=1)), None)
+            if hit is not None:
+                sampled[hit[0]] = hit[1]
+        return sorted(sampled.items())
                 
-        if records:
-            selected = random.sample(records, min(count, len(records)))
-            for key, data in selected:
-                print(f"\n{Fore.YELLOW}Record Key:{Style.RESET_ALL} {key.decode()}")
-                self.print_formatted_data(self.format_data(data))
+    def get_driver_summaries(self, year: str, meeting_key: str, session_key: str) -> List[Dict[str, Any]]:
+        """Retrieve and display per-driver rollups for a session from f1_summary."""
+        self.print_section_header("Driver Session Summaries")
+        
+        summaries = self.fetch_driver_summaries(year, meeting_key, session_key)
+        for summary in summaries:
+            print(f"\n{Fore.YELLOW}Driver {summary['driver_number']}{Style.RESET_ALL}")
+            self.print_formatted_data(summary)
+        return summaries
+    
+    def fetch_driver_summaries(self, year: str, meeting_key: str, session_key: str) -> List[Dict[str, Any]]:
+        """Per-driver summaries of a session, computed from the f1_summary rollups."""
+        prefix = f"{year}#{meeting_key}#{session_key}#".encode()
+        summaries = []
+        for key, data in self.summary_table.scan(row_prefix=prefix, columns=['rollup']):
+            rollup = self.format_data(data)
+            summary = {
+                'driver_number': rollup['driver_number'],
+                'top_speed': rollup.get('speed_max'),
+                'avg_speed': self.rollup_mean(rollup, 'speed'),
+                'drs_activations': rollup.get('drs_activations'),
+                'laps': rollup.get('lap_duration_count'),
+                'best_lap_time': rollup.get('lap_duration_min'),
+                'avg_lap_time': self.rollup_mean(rollup, 'lap_duration'),
+                'pit_stops': rollup.get('pit_duration_count'),
+                'avg_pit_time': self.rollup_mean(rollup, 'pit_duration')
+            }
+            summaries.append(summary)
+        return summaries
+    
+    @staticmethod
+    def rollup_mean(rollup: Dict[str, Any], name: str) -> Any:
+        """Compute the mean of a rolled-up field, or None when it has no samples."""
+        count = float(rollup.get(f"{name}_count") or 0)
+        if not count:
+            return None
+        return round(float(rollup[f"{name}_sum"]) / count, 3)
                 
     def get_driver_data(self, session_key: str, driver_number: int = 1):
         """Retrieve and display various data types for a specific driver."""
-        column_families = ['car', 'interval', 'laps', 'location', 'pit', 
+        column_families = ['car', 'intervals', 'laps', 'location', 'pit', 
                          'position', 'stints', 'teamradio']
         
         for cf in column_families:
             self.print_section_header(f"Driver {driver_number} - {cf} Data")
-            self.get_random_records(f"{session_key}#{driver_number}", cf)
+            mode = 'seek' if cf in TIME_SERIES_FAMILIES else 'reservoir'
+            self.get_random_records(session_key, cf, driver_number=driver_number, mode=mode)
 
 def main():
     try:
@@ -111,6 +401,13 @@ def main():
         # Get drivers info
         reader.get_drivers(session_info['session_key'])
         
+        # Get per-driver summaries from the ingest-time rollups
+        reader.get_driver_summaries(
+            meeting_info['year'],
+            meeting_info['meeting_key'],
+            session_info['session_key']
+        )
+        
         # Get random race control and weather data
         reader.get_random_records(session_info['session_key'], 'racecontrol')
         reader.get_random_records(session_info['session_key'], 'weather')
@@ -0,0 +1,510 @@
+"""
+Synthetic F1 dataset generator and Spark analytics benchmark.
+
+Generates realistic-volume `f1_data` / `f1_summary` rows (telemetry at the
+OpenF1 sampling rate of ~3.7 Hz, 20 drivers per session) into an in-memory
+HBase stand-in, optionally exports them to a Parquet snapshot, and times
+every analysis of spark_process.py under local[*] across dataset sizes.
+
+Usage:
+    python f1_benchmark.py --sessions 1 2 4 --output benchmark.json
+    python f1_benchmark.py --sessions 2 --duration 600 --parquet /tmp/f1_snapshot
+"""
+import argparse
+import json
+import math
+import random
+import resource
+import time
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pyspark.sql import SparkSession
+
+from f1_local_engine import run_local_analyses
+from f1_pyramid import TelemetryPyramid
+from hbase_populate_openF1 import DriverRollup, HBaseConnector, SessionIndex
+from spark_process import (AnalysisPlanner, SNAPSHOT_SOURCES, analyze_driver_performance,
+                           analyze_pit_stops, analyze_race_progress, analyze_telemetry_data,
+                           analyze_telemetry_pyramid, analyze_telemetry_sketches,
+                           analyze_tyre_strategy,
+                           collect_stage_metrics, driver_performance_metrics,
+                           fetch_data_from_hbase, pit_stop_metrics, race_progress_metrics,
+                           telemetry_metrics, tyre_strategy_metrics, write_parquet_snapshot)
+
+SESSION_TYPES = ['Practice', 'Qualifying', 'Race']
+DRIVER_NUMBERS = [1, 11, 16, 55, 44, 63, 4, 81, 14, 18, 10, 31, 23, 2, 27, 20, 22, 3, 77, 24]
+COMPOUNDS = ['SOFT', 'MEDIUM', 'HARD']
+
+ANALYSES = [
+    ('driver_performance', analyze_driver_performance),
+    ('telemetry', analyze_telemetry_data),
+    ('telemetry_pyramid', analyze_telemetry_pyramid),
+    ('pit_stops', analyze_pit_stops),
+    ('race_progress', analyze_race_progress),
+    ('tyre_strategy', analyze_tyre_strategy),
+    ('telemetry_sketches', analyze_telemetry_sketches)
+]
+
+def _to_bytes(value) -> bytes:
+    """Encode str arguments the way happybase accepts them"""
+    return value.encode() if isinstance(value, str) else value
+
+class LocalHBaseTable:
+    """In-memory table exposing the subset of happybase.Table used by the scripts"""
+
+    def __init__(self, families: Iterable[str] = ()):
+        self.families = {_to_bytes(family) for family in families}
+        self._rows: Dict[bytes, Dict[bytes, bytes]] = {}
+        self._sorted_keys: List[bytes] = []
+        self._dirty = False
+
+    def put(self, row: bytes, data: Dict[bytes, bytes]):
+        """Insert or update cells of a row"""
+        row = _to_bytes(row)
+        if row not in self._rows:
+            self._rows[row] = {}
+            self._dirty = True
+        self._rows[row].update({_to_bytes(k): _to_bytes(v) for k, v in data.items()})
+
+    def delete(self, row: bytes, columns: Optional[List[str]] = None):
+        """Delete a row, or only some of its columns"""
+        row = _to_bytes(row)
+        if row not in self._rows:
+            return
+        if columns is None:
+            del self._rows[row]
+            self._dirty = True
+            return
+        data = self._rows[row]
+        for column in list(data):
+            if self._column_selected(column, self._column_filter(columns)):
+                del data[column]
+
+    @staticmethod
+    def _column_filter(columns: Optional[List[str]]):
+        """Split a happybase column list into families and exact qualifiers"""
+        if columns is None:
+            return None
+        families, qualifiers = set(), set()
+        for column in map(_to_bytes, columns):
+            (qualifiers if b':' in column else families).add(column)
+        return families, qualifiers
+
+    @staticmethod
+    def _column_selected(column: bytes, column_filter) -> bool:
+        if column_filter is None:
+            return True
+        families, qualifiers = column_filter
+        return column in qualifiers or column.split(b':', 1)[0] in families
+
+    def _select(self, data: Dict[bytes, bytes], column_filter) -> Dict[bytes, bytes]:
+        if column_filter is None:
+            return dict(data)
+        return {k: v for k, v in data.items() if self._column_selected(k, column_filter)}
+
+    def row(self, row: bytes, columns: Optional[List[str]] = None) -> Dict[bytes, bytes]:
+        """Fetch a single row"""
+        return self._select(self._rows.get(_to_bytes(row), {}), self._column_filter(columns))
+
+    def rows(self, rows: List[bytes], columns: Optional[List[str]] = None) -> List[Tuple[bytes, Dict]]:
+        """Fetch several rows, skipping missing ones"""
+        column_filter = self._column_filter(columns)
+        result = []
+        for row in map(_to_bytes, rows):
+            data = self._select(self._rows.get(row, {}), column_filter)
+            if data:
+                result.append((row, data))
+        return result
+
+    def scan(self, row_start=None, row_stop=None, row_prefix=None, columns=None,
+             limit=None, **kwargs):
+        """Iterate rows in key order, like happybase.Table.scan"""
+        if self._dirty:
+            self._sorted_keys = sorted(self._rows)
+            self._dirty = False
+        if row_prefix is not None:
+            row_start = _to_bytes(row_prefix)
+            row_stop = self._prefix_stop(row_start)
+        row_start = _to_bytes(row_start) or b''
+        row_stop = _to_bytes(row_stop)
+
+        column_filter = self._column_filter(columns)
+        keys = self._sorted_keys
+        low, high = 0, len(keys)
+        while low < high:
+            middle = (low + high) // 2
+            if keys[middle] < row_start:
+                low = middle + 1
+            else:
+                high = middle
+        returned = 0
+        for key in keys[low:]:
+            if row_stop and key >= row_stop:
+                break
+            data = self._select(self._rows.get(key, {}), column_filter)
+            if not data:
+                continue
+            yield key, data
+            returned += 1
+            if limit is not None and returned >= limit:
+                break
+
+    @staticmethod
+    def _prefix_stop(prefix: bytes) -> Optional[bytes]:
+        """Smallest key greater than every key starting with prefix"""
+        stripped = prefix.rstrip(b'\xff')
+        if not stripped:
+            return None
+        return stripped[:-1] + bytes([stripped[-1] + 1])
+
+class LocalHBaseConnection:
+    """In-memory stand-in for happybase.Connection"""
+
+    def __init__(self):
+        self._tables: Dict[bytes, LocalHBaseTable] = {}
+
+    def tables(self) -> List[bytes]:
+        return list(self._tables)
+
+    def create_table(self, name: str, families: Dict[str, Dict]):
+        self._tables[_to_bytes(name)] = LocalHBaseTable(families)
+
+    def delete_table(self, name: str, disable: bool = False):
+        self._tables.pop(_to_bytes(name), None)
+
+    def table(self, name: str) -> LocalHBaseTable:
+        return self._tables.setdefault(_to_bytes(name), LocalHBaseTable())
+
+    def close(self):
+        pass
+
+    def row_count(self) -> int:
+        """Total number of rows across all tables"""
+        return sum(len(table._rows) for table in self._tables.values())
+
+class SyntheticF1Generator:
+    """Writes synthetic sessions with the same row keys and encoding as the ingester"""
+
+    def __init__(self, connection, seed: int = 42, hz: float = 3.7):
+        """
+        Initialize the generator
+
+        Args:
+            connection: happybase-compatible connection to write to
+            seed (int): Random seed for reproducible datasets
+            hz (float): Telemetry sampling rate
+        """
+        self.hbase = HBaseConnector(connection=connection, initialize_tables=True)
+        self.random = random.Random(seed)
+        self.hz = hz
+
+    @staticmethod
+    def generate_row_key(*components) -> str:
+        """Same layout as F1DataCollector.generate_row_key"""
+        return "#".join(map(str, components))
+
+    def generate(self, sessions: int, drivers: int = 20, duration: int = 5400):
+        """
+        Generate a dataset
+
+        Args:
+            sessions (int): Number of sessions, three per meeting
+            drivers (int): Drivers per session (max 20)
+            duration (int): Session length in seconds
+        """
+        start = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+        for number in range(sessions):
+            year, meeting_key, session_key = 2024, 1200 + number // 3, 9000 + number
+            session_start = start + timedelta(days=number)
+            session = {
+                'session_key': session_key,
+                'meeting_key': meeting_key,
+                'year': year,
+                'session_type': SESSION_TYPES[number % 3],
+                'session_name': SESSION_TYPES[number % 3],
+                'date_start': session_start.isoformat(),
+                'date_end': (session_start + timedelta(seconds=duration)).isoformat()
+            }
+            index = SessionIndex(year, meeting_key, session)
+            session_row_key = self.generate_row_key(year, meeting_key, session_key)
+            self.hbase.store_data('f1_data', session_row_key, session, 'session')
+            index.observe('session', session_row_key)
+            for driver_number in DRIVER_NUMBERS[:drivers]:
+                index.add_driver({'driver_number': driver_number, 'session_key': session_key,
+                                  'meeting_key': meeting_key})
+                self._generate_driver(year, meeting_key, session, driver_number,
+                                      session_start, duration, index)
+            for column_family, columns in index.to_columns().items():
+                if columns:
+                    self.hbase.store_data('f1_index', str(session_key), columns, column_family)
+
+    def _generate_driver(self, year: int, meeting_key: int, session: Dict[str, Any],
+                         driver_number: int, session_start: datetime, duration: int,
+                         index: SessionIndex):
+        """Generate telemetry, pyramid levels, laps, pits, positions, stints, rollups and index ranges for one driver"""
+        rng = self.random
+        session_key = session['session_key']
+        prefix = (year, meeting_key, session_key, driver_number)
+        rollup = DriverRollup()
+        pyramid = TelemetryPyramid(driver_number)
+        pace = rng.uniform(-1.5, 1.5)
+
+        # Telemetry at the OpenF1 sampling rate
+        samples = int(duration * self.hz)
+        for sample in range(samples):
+            moment = session_start + timedelta(seconds=sample / self.hz)
+            phase = 2 * math.pi * sample / (self.hz * 90)
+            speed = max(60.0, min(345.0, 210 + 110 * math.sin(phase) + rng.gauss(0, 8)))
+            date = moment.isoformat()
+            car = {
+                'date': date,
+                'session_key': session_key,
+                'meeting_key': meeting_key,
+                'driver_number': driver_number,
+                'speed': round(speed),
+                'rpm': int(7000 + speed * 15 + rng.gauss(0, 150)),
+                'throttle': 100 if speed > 200 else rng.randint(0, 99),
+                'brake': 100 if speed < 120 else 0,
+                'n_gear': min(8, 1 + int(speed // 42)),
+                'drs': 12 if speed > 290 and rng.random() < 0.6 else rng.choice([0, 1, 8])
+            }
+            location = {
+                'date': date,
+                'session_key': session_key,
+                'meeting_key': meeting_key,
+                'driver_number': driver_number,
+                'x': int(4000 * math.cos(phase)),
+                'y': int(2500 * math.sin(phase)),
+                'z': int(100 * math.sin(phase / 2))
+            }
+            row_key = self.generate_row_key(*prefix, date)
+            self.hbase.store_data('f1_data', row_key, car, 'car')
+            self.hbase.store_data('f1_data', row_key, location, 'location')
+            rollup.observe('car', car)
+            pyramid.observe('car', car)
+            pyramid.observe('location', location)
+            index.observe('car', row_key)
+            index.observe('location', row_key)
+
+        # Laps, stints, pit stops and positions
+        laps = max(1, int(duration // (90 + pace)))
+        pit_laps = sorted(rng.sample(range(2, laps), k=min(2, max(0, laps - 2))))
+        lap_start = session_start
+        for lap_number in range(1, laps + 1):
+            sectors = [round(rng.gauss(30 + pace / 3, 0.4), 3) for _ in range(3)]
+            lap = {
+                'session_key': session_key,
+                'meeting_key': meeting_key,
+                'driver_number': driver_number,
+                'lap_number': lap_number,
+                'date_start': lap_start.isoformat(),
+                'lap_duration': round(sum(sectors), 3),
+                'duration_sector_1': sectors[0],
+                'duration_sector_2': sectors[1],
+                'duration_sector_3': sectors[2],
+                'is_pit_out_lap': lap_number - 1 in pit_laps
+            }
+            self._store_driver_item(prefix, lap, 'laps', rollup, index)
+            lap_start += timedelta(seconds=lap['lap_duration'])
+
+            position = {
+                'session_key': session_key,
+                'meeting_key': meeting_key,
+                'driver_number': driver_number,
+                'date': lap_start.isoformat(),
+                'position': rng.randint(1, 20)
+            }
+            self._store_driver_item(prefix, position, 'position', rollup, index)
+
+        for pit_lap in pit_laps:
+            pit = {
+                'session_key': session_key,
+                'meeting_key': meeting_key,
+                'driver_number': driver_number,
+                'lap_number': pit_lap,
+                'pit_duration': round(rng.uniform(20.5, 26.0), 3)
+            }
+            self._store_driver_item(prefix, pit, 'pit', rollup, index)
+
+        boundaries = [1] + [lap + 1 for lap in pit_laps] + [laps + 1]
+        for stint_number, (first, last) in enumerate(zip(boundaries, boundaries[1:]), start=1):
+            stint = {
+                'session_key': session_key,
+                'meeting_key': meeting_key,
+                'driver_number': driver_number,
+                'stint_number': stint_number,
+                'compound': rng.choice(COMPOUNDS),
+                'lap_start': first,
+                'lap_end': last - 1
+            }
+            self._store_driver_item(prefix, stint, 'stints', rollup, index)
+
+        for column_family, key, cells in pyramid.rows(index.driver_lap_windows(driver_number)):
+            row_key = self.generate_row_key(*prefix, key)
+            self.hbase.store_data('f1_data', row_key, cells, column_family)
+            index.observe(column_family, row_key)
+
+        summary = {
+            'year': year,
+            'meeting_key': meeting_key,
+            'session_key': session_key,
+            'session_type': session['session_type'],
+            'driver_number': driver_number
+        }
+        summary.update(rollup.to_columns())
+        summary_key = self.generate_row_key(*prefix)
+        self.hbase.store_data('f1_summary', summary_key, summary, 'rollup')
+        self.hbase.store_data('f1_summary', summary_key, rollup.to_sketch_columns(), 'sketch')
+
+    def _store_driver_item(self, prefix: Tuple, item: Dict[str, Any], column_family: str,
+                           rollup: DriverRollup, index: SessionIndex):
+        """Store a driver-specific record keyed like F1DataCollector.process_session"""
+        row_key = self.generate_row_key(*prefix, item.get('lap_number') or item.get('time'))
+        self.hbase.store_data('f1_data', row_key, item, column_family)
+        rollup.observe(column_family, item)
+        index.observe(column_family, row_key, item)
+
+def peak_memory(spark) -> Dict[str, float]:
+    """Peak resident memory of this Python driver and its JVM, in MB"""
+    usage = {
+        'python_peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'children_peak_rss_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        'jvm_peak_heap_mb': None
+    }
+    ui_url = spark.sparkContext.uiWebUrl
+    if ui_url:
+        url = f"{ui_url}/api/v1/applications/{spark.sparkContext.applicationId}/executors"
+        try:
+            with urllib.request.urlopen(url, timeout=10) as response:
+                for executor in json.loads(response.read().decode('utf-8')):
+                    if executor.get('id') == 'driver':
+                        heap = executor.get('peakMemoryMetrics', {}).get('JVMHeapMemory')
+                        usage['jvm_peak_heap_mb'] = heap / (1024 * 1024) if heap else None
+        except Exception:
+            pass
+    return usage
+
+def diff_metrics(before: Dict[str, int], after: Dict[str, int]) -> Dict[str, int]:
+    """Metrics attributable to the work done between two snapshots"""
+    return {key: after[key] - before[key] for key in after}
+
+def benchmark_dataset(spark, connection, parquet_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Time source loading and every analysis against one generated dataset
+
+    Returns:
+        Dict: Load timings, per-analysis timings and Spark metrics
+    """
+    report: Dict[str, Any] = {'load': {}, 'analyses': {}}
+
+    for table, column_family in SNAPSHOT_SOURCES:
+        started = time.perf_counter()
+        data = fetch_data_from_hbase(connection, table, column_family)
+        fetched = time.perf_counter()
+        rows = spark.createDataFrame(data).count() if data else 0
+        report['load'][f"{table}:{column_family}"] = {
+            'rows': rows,
+            'scan_seconds': round(fetched - started, 3),
+            'create_dataframe_seconds': round(time.perf_counter() - fetched, 3)
+        }
+
+    for name, analysis in ANALYSES:
+        before = collect_stage_metrics(spark)
+        started = time.perf_counter()
+        outputs = analysis(spark, connection)
+        if not isinstance(outputs, tuple):
+            outputs = (outputs,)
+        # Metrics whose source has no rows come back as None
+        result_rows = sum(len(df.toPandas()) for df in outputs if df is not None)
+        elapsed = time.perf_counter() - started
+        report['analyses'][name] = {
+            'seconds': round(elapsed, 3),
+            'result_rows': result_rows,
+            **diff_metrics(before, collect_stage_metrics(spark))
+        }
+
+    started = time.perf_counter()
+    local_results = run_local_analyses(connection, [None])
+    report['analyses']['all_on_local_engine'] = {
+        'seconds': round(time.perf_counter() - started, 3),
+        'result_rows': sum(len(frame) for frame in local_results.values())
+    }
+
+    if parquet_path:
+        write_parquet_snapshot(spark, connection, parquet_path, SNAPSHOT_SOURCES)
+        before = collect_stage_metrics(spark)
+        started = time.perf_counter()
+        planner = AnalysisPlanner(spark, None, snapshot_path=parquet_path)
+        planner.add(*driver_performance_metrics(), *telemetry_metrics(), *pit_stop_metrics(),
+                    *race_progress_metrics(), *tyre_strategy_metrics())
+        for df in planner.execute().values():
+            df.toPandas()
+        planner.release()
+        report['analyses']['all_from_parquet'] = {
+            'seconds': round(time.perf_counter() - started, 3),
+            **diff_metrics(before, collect_stage_metrics(spark))
+        }
+
+    report['memory'] = peak_memory(spark)
+    return report
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Synthetic F1 data generator and Spark benchmark")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4],
+                        help="Dataset sizes to benchmark, in sessions")
+    parser.add_argument("--drivers", type=int, default=20, help="Drivers per session")
+    parser.add_argument("--duration", type=int, default=5400, help="Session length in seconds")
+    parser.add_argument("--hz", type=float, default=3.7, help="Telemetry sampling rate")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--parquet", help="Also export each dataset to Parquet under this directory")
+    parser.add_argument("--output", help="Write the benchmark report to this JSON file")
+    return parser.parse_args()
+
+def main():
+    """Generate each dataset size and benchmark the analyses on it"""
+    args = parse_args()
+    spark = (SparkSession.builder
+             .master("local[*]")
+             .appName("F1 Analysis Benchmark")
+             .getOrCreate())
+    reports = []
+    try:
+        for sessions in args.sessions:
+            connection = LocalHBaseConnection()
+            started = time.perf_counter()
+            SyntheticF1Generator(connection, args.seed, args.hz).generate(
+                sessions, args.drivers, args.duration)
+            generation_seconds = round(time.perf_counter() - started, 3)
+
+            parquet_path = f"{args.parquet}/sessions_{sessions}" if args.parquet else None
+            report = benchmark_dataset(spark, connection, parquet_path)
+            report.update({
+                'sessions': sessions,
+                'drivers': args.drivers,
+                'rows': connection.row_count(),
+                'generation_seconds': generation_seconds
+            })
+            reports.append(report)
+
+            print(f"\n== {sessions} session(s), {report['rows']} rows "
+                  f"(generated in {generation_seconds}s) ==")
+            for source, load in report['load'].items():
+                print(f"  load {source:<22} {load['rows']:>9} rows  "
+                      f"scan {load['scan_seconds']:>7}s  df {load['create_dataframe_seconds']:>7}s")
+            for name, result in report['analyses'].items():
+                print(f"  {name:<27} {result['seconds']:>8}s  "
+                      f"shuffle r/w {result.get('shuffle_read_bytes', 0)}/"
+                      f"{result.get('shuffle_write_bytes', 0)} B")
+            print(f"  peak memory: {report['memory']}")
+    finally:
+        spark.stop()
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(reports, output, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+JSON decoding and HBase cell encoding for the F1 ingester.
+
+json_loads uses orjson when it is installed and the standard library
+otherwise. orjson rejects NaN and Infinity, which json accepts, so
+documents orjson cannot parse are decoded again with json. Integers beyond
+64 bits, which OpenF1 does not send, are read as floats by orjson.
+
+CellEncoder turns records into HBase cells with the same bytes as
+`f"{family}:{key}".encode()` and `str(value).encode()`, but caches the
+encoded qualifiers of every column family, so encoding a record is mostly
+dictionary lookups.
+"""
+import json
+from typing import Any, Dict, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+# Qualifier holding a row's content fingerprint within each column family.
+# Readers skip it when decoding cells into records.
+FINGERPRINT_QUALIFIER = '_fp'
+
+def json_loads(payload: Union[str, bytes]) -> Any:
+    """Decode a JSON document with the fastest available parser"""
+    if orjson is not None:
+        try:
+            return orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            # Stricter than json, let it decide whether the document is valid
+            pass
+    return json.loads(payload)
+
+# Encoded small non-negative integers: gears, DRS, throttle, brake, positions, lap numbers
+SMALL_INTS = tuple(str(number).encode() for number in range(1024))
+
+def encode_value(value: Any) -> bytes:
+    """Encode a cell value exactly like str(value).encode()"""
+    value_type = type(value)
+    if value_type is str:
+        return value.encode()
+    if value_type is int and 0 <= value < 1024:
+        return SMALL_INTS[value]
+    return str(value).encode()
+
+class CellEncoder:
+    """Builds HBase cells for records, caching encoded qualifiers per column family"""
+
+    def __init__(self):
+        # Column family name as given -> normalized family name
+        self._families: Dict[str, str] = {}
+        # Normalized family -> record key -> encoded b'family:key'
+        self._qualifiers: Dict[str, Dict[str, bytes]] = {}
+        # Normalized family -> metadata key -> encoded b'family:_meta_key'
+        self._meta_qualifiers: Dict[str, Dict[str, bytes]] = {}
+
+    def family(self, column_family: str) -> str:
+        """Normalized column family name, e.g. 'race_control' -> 'racecontrol'"""
+        family = self._families.get(column_family)
+        if family is None:
+            family = self._families[column_family] = column_family.replace('_', '').lower()
+        return family
+
+    def qualifier(self, family: str, key: str) -> bytes:
+        """Encoded b'family:key' for a normalized family"""
+        qualifiers = self._qualifiers.get(family)
+        if qualifiers is None:
+            qualifiers = self._qualifiers[family] = {}
+        encoded = qualifiers.get(key)
+        if encoded is None:
+            encoded = qualifiers[key] = f"{family}:{key}".encode()
+        return encoded
+
+    def encode(self, family: str, data: Dict[str, Any]) -> Dict[bytes, bytes]:
+        """Cells for a record in a normalized family"""
+        qualifiers = self._qualifiers.get(family)
+        if qualifiers is None:
+            qualifiers = self._qualifiers[family] = {}
+        small_ints = SMALL_INTS
+        columns = {}
+        for key, value in data.items():
+            encoded = qualifiers.get(key)
+            if encoded is None:
+                encoded = qualifiers[key] = f"{family}:{key}".encode()
+            # encode_value inlined, this loop runs once per telemetry cell
+            value_type = type(value)
+            if value_type is str:
+                columns[encoded] = value.encode()
+            elif value_type is int and 0 <= value < 1024:
+                columns[encoded] = small_ints[value]
+            else:
+                columns[encoded] = str(value).encode()
+        return columns
+
+    def encode_metadata(self, family: str, metadata: Dict[str, Any]) -> Dict[bytes, bytes]:
+        """Cells for bookkeeping metadata, stored under '_meta_' qualifiers"""
+        qualifiers = self._meta_qualifiers.get(family)
+        if qualifiers is None:
+            qualifiers = self._meta_qualifiers[family] = {}
+        columns = {}
+        for key, value in metadata.items():
+            encoded = qualifiers.get(key)
+            if encoded is None:
+                encoded = qualifiers[key] = f"{family}:_meta_{key}".encode()
+            columns[encoded] = encode_value(value)
+        return columns
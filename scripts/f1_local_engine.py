@@ -0,0 +1,234 @@
+"""
+Local NumPy engine for single-session F1 analytics.
+
+Computes the same results as the Spark analyses of spark_process.py
+(lap_times, sector_performance, speed_analysis, drs_usage, pit_stops,
+position_changes, tyre_strategy) from one prefix scan per column family,
+using vectorized group-by kernels instead of a SparkSession. Intended for
+small scopes such as a single session, where starting Spark on YARN costs
+more than the query itself.
+"""
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+DRS_OPEN_VALUES = (10, 12, 14)
+
+def _to_float(value: bytes) -> float:
+    """Decode a stored cell into a float, NaN when missing or not numeric"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+class ColumnBatch:
+    """Columnar view of one column family within a scope"""
+
+    def __init__(self, numeric: Dict[str, np.ndarray], text: Dict[str, np.ndarray], rows: int):
+        self.numeric = numeric
+        self.text = text
+        self.rows = rows
+
+def load_columns(connection, prefixes: Sequence[Optional[str]], column_family: str,
+                 numeric_fields: Sequence[str], text_fields: Sequence[str] = (),
+                 row_filter: Optional[Callable[[str], bool]] = None,
+                 table_name: str = 'f1_data') -> ColumnBatch:
+    """
+    Scan a column family and build NumPy columns for the requested fields
+
+    driver_number falls back to the fourth row-key component when the
+    record itself does not carry it.
+
+    Args:
+        connection: happybase-compatible connection
+        prefixes (Sequence[Optional[str]]): Row prefixes to scan
+        column_family (str): Column family to read
+        numeric_fields (Sequence[str]): Qualifiers decoded as float64
+        text_fields (Sequence[str]): Qualifiers kept as strings
+        row_filter (Callable, optional): Extra row-key predicate
+        table_name (str): HBase table name
+    """
+    table = connection.table(table_name)
+    numeric_columns = {name: f"{column_family}:{name}".encode() for name in numeric_fields}
+    text_columns = {name: f"{column_family}:{name}".encode() for name in text_fields}
+    driver_column = f"{column_family}:driver_number".encode()
+    numeric_values: Dict[str, List[float]] = {name: [] for name in numeric_fields}
+    text_values: Dict[str, List[str]] = {name: [] for name in text_fields}
+    drivers: List[str] = []
+
+    for prefix in prefixes:
+        for key, data in table.scan(row_prefix=prefix.encode() if prefix else None,
+                                    columns=[column_family]):
+            row_key = key.decode('utf-8')
+            if row_filter and not row_filter(row_key):
+                continue
+            driver = data.get(driver_column)
+            if driver is not None:
+                drivers.append(driver.decode('utf-8'))
+            else:
+                parts = row_key.split('#')
+                drivers.append(parts[3] if len(parts) > 3 else '')
+            for name, column in numeric_columns.items():
+                numeric_values[name].append(_to_float(data.get(column)))
+            for name, column in text_columns.items():
+                value = data.get(column)
+                text_values[name].append(value.decode('utf-8') if value is not None else '')
+
+    numeric = {name: np.asarray(values, dtype=np.float64) for name, values in numeric_values.items()}
+    text = {name: np.asarray(values, dtype=object) for name, values in text_values.items()}
+    text['driver_number'] = np.asarray(drivers, dtype=object)
+    return ColumnBatch(numeric, text, len(drivers))
+
+class GroupIndex:
+    """Dense group ids for one or more key columns, built once per batch"""
+
+    def __init__(self, *keys: np.ndarray):
+        # One row per record, one column per key: unique rows are the groups
+        combined = np.stack([key.astype(str) for key in keys], axis=1)
+        labels, inverse = np.unique(combined, axis=0, return_inverse=True)
+        self.inverse = inverse.reshape(-1)
+        self.size = len(labels)
+        self.keys = [labels[:, index].astype(object) for index in range(len(keys))]
+
+    def count(self, mask: np.ndarray) -> np.ndarray:
+        return np.bincount(self.inverse[mask], minlength=self.size)
+
+    def sum(self, values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        return np.bincount(self.inverse[mask], weights=values[mask], minlength=self.size)
+
+    def mean(self, values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        counts = self.count(mask)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, self.sum(values, mask) / counts, np.nan)
+
+    def min(self, values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        result = np.full(self.size, np.inf)
+        np.minimum.at(result, self.inverse[mask], values[mask])
+        return np.where(np.isinf(result), np.nan, result)
+
+    def max(self, values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        result = np.full(self.size, -np.inf)
+        np.maximum.at(result, self.inverse[mask], values[mask])
+        return np.where(np.isinf(result), np.nan, result)
+
+def _frame(group: GroupIndex, key_names: Sequence[str], matched: np.ndarray,
+           columns: Dict[str, np.ndarray], order_by: Sequence[str] = (),
+           ascending: Sequence[bool] = ()) -> pd.DataFrame:
+    """Assemble a result frame, keeping only groups with matching rows"""
+    frame = pd.DataFrame({name: key for name, key in zip(key_names, group.keys)})
+    for name, values in columns.items():
+        frame[name] = values
+    frame = frame[matched > 0]
+    if order_by:
+        frame = frame.sort_values(list(order_by), ascending=list(ascending))
+    return frame.reset_index(drop=True)
+
+def lap_metrics(laps: ColumnBatch) -> Dict[str, pd.DataFrame]:
+    """lap_times and sector_performance, same columns as the Spark metrics"""
+    group = GroupIndex(laps.text['driver_number'])
+    duration = laps.numeric['lap_duration']
+    timed = ~np.isnan(duration)
+    counted = timed & ~np.isnan(laps.numeric['lap_number'])
+    lap_times = _frame(group, ['driver_number'], group.count(timed), {
+        'avg_lap_time': group.mean(duration, timed),
+        'best_lap_time': group.min(duration, timed),
+        'total_laps': group.count(counted)
+    }, ['avg_lap_time'], [True])
+
+    sectors = [laps.numeric[f'duration_sector_{index}'] for index in (1, 2, 3)]
+    complete = ~np.isnan(sectors[0]) & ~np.isnan(sectors[1]) & ~np.isnan(sectors[2])
+    sector_performance = _frame(group, ['driver_number'], group.count(complete), {
+        f'avg_sector{index}': group.mean(values, complete)
+        for index, values in enumerate(sectors, start=1)
+    })
+    return {'lap_times': lap_times, 'sector_performance': sector_performance}
+
+def telemetry_metrics(car: ColumnBatch) -> Dict[str, pd.DataFrame]:
+    """speed_analysis and drs_usage, same columns as the Spark metrics"""
+    group = GroupIndex(car.text['driver_number'])
+    speed = car.numeric['speed']
+    has_speed = ~np.isnan(speed)
+    speed_analysis = _frame(group, ['driver_number'], group.count(has_speed), {
+        'top_speed': group.max(speed, has_speed),
+        'avg_speed': group.mean(speed, has_speed)
+    }, ['top_speed'], [False])
+
+    drs = car.numeric['drs']
+    has_drs = ~np.isnan(drs)
+    drs_usage = _frame(group, ['driver_number'], group.count(has_drs), {
+        'drs_activations': group.count(has_drs & np.isin(drs, DRS_OPEN_VALUES))
+    }, ['drs_activations'], [False])
+    return {'speed_analysis': speed_analysis, 'drs_usage': drs_usage}
+
+def pit_metrics(pit: ColumnBatch) -> Dict[str, pd.DataFrame]:
+    """pit_stops, same columns as the Spark metric"""
+    group = GroupIndex(pit.text['driver_number'])
+    duration = pit.numeric['pit_duration']
+    timed = ~np.isnan(duration)
+    return {'pit_stops': _frame(group, ['driver_number'], group.count(timed), {
+        'avg_pit_time': group.mean(duration, timed),
+        'fastest_pit': group.min(duration, timed),
+        'slowest_pit': group.max(duration, timed),
+        'pit_stops': group.count(timed)
+    }, ['avg_pit_time'], [True])}
+
+def position_metrics(position: ColumnBatch) -> Dict[str, pd.DataFrame]:
+    """position_changes, same columns as the Spark metric"""
+    group = GroupIndex(position.text['driver_number'])
+    values = position.numeric['position']
+    every_row = np.ones(position.rows, dtype=bool)
+    return {'position_changes': _frame(group, ['driver_number'], group.count(every_row), {
+        'laps_led': group.count(values == 1),
+        'avg_position': group.mean(values, ~np.isnan(values))
+    }, ['avg_position'], [True])}
+
+def tyre_metrics(stints: ColumnBatch) -> Dict[str, pd.DataFrame]:
+    """tyre_strategy, same columns as the Spark metric"""
+    group = GroupIndex(stints.text['driver_number'], stints.text['compound'])
+    length = stints.numeric['lap_end'] - stints.numeric['lap_start']
+    every_row = np.ones(stints.rows, dtype=bool)
+    return {'tyre_strategy': _frame(group, ['driver_number', 'compound'], group.count(every_row), {
+        'avg_stint_length': group.mean(length, ~np.isnan(length)),
+        'number_of_stints': group.count(~np.isnan(stints.numeric['stint_number']))
+    }, ['driver_number', 'compound'], [True, True])}
+
+# Column family -> (numeric fields, text fields, kernel)
+LOCAL_ANALYSES = {
+    'laps': (['lap_duration', 'lap_number', 'duration_sector_1', 'duration_sector_2',
+              'duration_sector_3'], [], lap_metrics),
+    'car': (['speed', 'drs'], [], telemetry_metrics),
+    'pit': (['pit_duration'], [], pit_metrics),
+    'position': (['position'], [], position_metrics),
+    'stints': (['lap_start', 'lap_end', 'stint_number'], ['compound'], tyre_metrics)
+}
+
+def run_local_analyses(connection, prefixes: Sequence[Optional[str]],
+                       row_filter: Optional[Callable[[str], bool]] = None,
+                       families: Optional[Sequence[str]] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Run the analyses for a small scope without Spark
+
+    Args:
+        connection: happybase-compatible connection
+        prefixes (Sequence[Optional[str]]): Row prefixes of the scope
+        row_filter (Callable, optional): Extra row-key predicate
+        families (Sequence[str], optional): Restrict to these source column families
+
+    Returns:
+        Dict[str, pd.DataFrame]: Analysis name to result frame
+    """
+    results = {}
+    for column_family, (numeric_fields, text_fields, kernel) in LOCAL_ANALYSES.items():
+        if families is not None and column_family not in families:
+            continue
+        started = time.perf_counter()
+        batch = load_columns(connection, prefixes, column_family, numeric_fields,
+                             text_fields, row_filter)
+        if batch.rows:
+            results.update(kernel(batch))
+        logging.info(f"Local {column_family} analysis: {batch.rows} rows in "
+                     f"{time.perf_counter() - started:.3f}s")
+    return results
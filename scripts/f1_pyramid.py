@@ -0,0 +1,177 @@
+"""
+Multi-resolution downsampled telemetry for F1 dashboards and overviews.
+
+The ingester keeps each driver's car and location samples for a session and
+writes them downsampled into one column family per level of f1_data:
+
+- pyramid10s / pyramid1s: fixed-width buckets, row key
+  {year}#{meeting_key}#{session_key}#{driver_number}#{bucket_start}
+- pyramidlap: one bucket per lap, on the laps row key
+  {year}#{meeting_key}#{session_key}#{driver_number}#{lap_number}
+
+Fixed-width buckets share the raw telemetry key space, so the same prefix,
+range and lap-window bounds apply to every level. Each bucket holds
+<channel>_count/_sum/_mean/_min/_max per channel, plus DRS counters.
+"""
+import bisect
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Fixed-width levels, coarsest first: (column family, bucket width in seconds)
+PYRAMID_LEVELS = (('pyramid10s', 10), ('pyramid1s', 1))
+LAP_LEVEL = 'pyramidlap'
+PYRAMID_FAMILIES = tuple(family for family, _ in PYRAMID_LEVELS) + (LAP_LEVEL,)
+# Bucket width of the coarsest level, the resolution of pyramid overviews
+COARSEST_RESOLUTION = PYRAMID_LEVELS[0][1]
+
+CHANNELS = {
+    'car': ('speed', 'rpm', 'throttle', 'n_gear', 'brake'),
+    'location': ('x', 'y', 'z')
+}
+DRS_OPEN_VALUES = (10, 12, 14)
+
+def parse_timestamp(date: str) -> float:
+    """POSIX timestamp of an OpenF1 ISO date"""
+    return datetime.fromisoformat(date.replace('Z', '+00:00')).timestamp()
+
+def format_timestamp(timestamp: float) -> str:
+    """ISO date in the +00:00 form used by the raw telemetry row keys"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+def bucket_start(date: str, width: int) -> str:
+    """Start of the bucket of the given width containing date"""
+    return format_timestamp(int(parse_timestamp(date) // width) * width)
+
+def pick_level(resolution: Optional[float] = None) -> Optional[str]:
+    """
+    Coarsest fixed-width level whose buckets are no wider than resolution
+
+    Args:
+        resolution (float, optional): Largest acceptable seconds between points,
+            None for full resolution
+
+    Returns:
+        Optional[str]: Column family, None when raw samples are needed
+    """
+    if resolution is None:
+        return None
+    for family, width in PYRAMID_LEVELS:
+        if width <= resolution:
+            return family
+    return None
+
+class Bucket:
+    """Count, sum, min and max of every channel over one time bucket"""
+
+    def __init__(self, channels: Tuple[str, ...]):
+        self.channels = channels
+        self.count = [0] * len(channels)
+        self.total = [0.0] * len(channels)
+        self.minimum: List[Optional[float]] = [None] * len(channels)
+        self.maximum: List[Optional[float]] = [None] * len(channels)
+        self.drs_samples = 0
+        self.drs_activations = 0
+
+    def add(self, values: Tuple[Optional[float], ...], drs: Optional[float]):
+        for position, value in enumerate(values):
+            if value is None:
+                continue
+            self.count[position] += 1
+            self.total[position] += value
+            if self.minimum[position] is None or value < self.minimum[position]:
+                self.minimum[position] = value
+            if self.maximum[position] is None or value > self.maximum[position]:
+                self.maximum[position] = value
+        if drs is not None:
+            self.drs_samples += 1
+            if drs in DRS_OPEN_VALUES:
+                self.drs_activations += 1
+
+    def to_columns(self, family: str) -> Dict[str, Any]:
+        columns = {}
+        for position, channel in enumerate(self.channels):
+            count = self.count[position]
+            columns[f"{channel}_count"] = count
+            columns[f"{channel}_sum"] = self.total[position]
+            columns[f"{channel}_mean"] = round(self.total[position] / count, 3) if count else ""
+            columns[f"{channel}_min"] = "" if self.minimum[position] is None else self.minimum[position]
+            columns[f"{channel}_max"] = "" if self.maximum[position] is None else self.maximum[position]
+        if family == 'car':
+            columns['drs_samples'] = self.drs_samples
+            columns['drs_activations'] = self.drs_activations
+        return columns
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class TelemetryPyramid:
+    """Downsampled car and location telemetry for one driver and session"""
+
+    def __init__(self, driver_number: Any):
+        self.driver_number = driver_number
+        # family -> [(timestamp, channel values, drs)], sorted by rows()
+        self.samples: Dict[str, List[Tuple[float, Tuple[Optional[float], ...], Optional[float]]]] = {
+            family: [] for family in CHANNELS
+        }
+
+    def observe(self, column_family: str, item: Dict[str, Any]):
+        """Keep the channels of a car or location sample that is being written to HBase"""
+        if column_family not in CHANNELS or not item.get('date'):
+            return
+        self.samples[column_family].append((
+            parse_timestamp(item['date']),
+            tuple(_to_float(item.get(channel)) for channel in CHANNELS[column_family]),
+            _to_float(item.get('drs')) if column_family == 'car' else None
+        ))
+
+    def _aggregate(self, family: str, samples) -> Bucket:
+        bucket = Bucket(CHANNELS[family])
+        for _, values, drs in samples:
+            bucket.add(values, drs)
+        return bucket
+
+    def rows(self, lap_windows: Optional[Dict[int, Tuple[str, str]]] = None
+             ) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Downsampled rows of every level
+
+        Args:
+            lap_windows (Dict, optional): lap_number -> [date_start, date_end) of this driver
+
+        Yields:
+            (column family, last row-key component, cells); car and location
+            buckets of the same level and key are merged into one row
+        """
+        for family in self.samples:
+            self.samples[family].sort(key=lambda sample: sample[0])
+
+        for level, width in PYRAMID_LEVELS:
+            merged: Dict[int, Dict[str, Any]] = {}
+            for family, samples in self.samples.items():
+                grouped: Dict[int, List] = {}
+                for sample in samples:
+                    grouped.setdefault(int(sample[0] // width) * width, []).append(sample)
+                for start, members in grouped.items():
+                    cells = merged.setdefault(start, {
+                        'driver_number': self.driver_number,
+                        'date_start': format_timestamp(start),
+                        'date_end': format_timestamp(start + width)
+                    })
+                    cells.update(self._aggregate(family, members).to_columns(family))
+            for start in sorted(merged):
+                yield level, merged[start]['date_start'], merged[start]
+
+        timestamps = {family: [sample[0] for sample in samples]
+                      for family, samples in self.samples.items()}
+        for lap_number, (date_start, date_end) in sorted((lap_windows or {}).items()):
+            lower, upper = parse_timestamp(date_start), parse_timestamp(date_end)
+            cells = {'driver_number': self.driver_number, 'lap_number': lap_number,
+                     'date_start': date_start, 'date_end': date_end}
+            for family, samples in self.samples.items():
+                members = samples[bisect.bisect_left(timestamps[family], lower):
+                                  bisect.bisect_left(timestamps[family], upper)]
+                cells.update(self._aggregate(family, members).to_columns(family))
+            yield LAP_LEVEL, str(lap_number), cells
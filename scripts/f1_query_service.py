@@ -0,0 +1,386 @@
+"""
+Async read service for the F1 data stored in HBase.
+
+Serves the F1DataReader queries over HTTP from a long-lived process: HBase
+connections come from a happybase.ConnectionPool, blocking reads run in a
+thread pool sized like the connection pool, and the encoded responses for
+hot sessions (session index, drivers, driver summaries) are kept in an LRU
+cache bounded by entry count, bytes and age. Request latencies are tracked
+per route and exposed with their percentiles on /stats.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import happybase
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exemples'))
+from hbase_read import F1DataReader, TIME_SERIES_FAMILIES
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+CONFIG = {
+    'hbase_host': 'localhost',
+    'hbase_port': 9090,
+    'pool_size': 8,
+    'cache_max_entries': 512,
+    'cache_max_bytes': 64 * 1024 * 1024,
+    'cache_ttl': 300,
+    'latency_window': 10000,
+    'max_sample_count': 500
+}
+
+class LRUCache:
+    """Least-recently-used cache bounded by entry count, total bytes and entry age"""
+
+    MISSING = object()
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        """
+        Initialize an empty cache
+
+        Args:
+            max_entries (int): Maximum number of entries
+            max_bytes (int): Maximum total size of the cached values
+            ttl (float): Seconds after which an entry expires
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (expires_at, size, value), least recently used first
+        self.entries: 'OrderedDict[Any, tuple]' = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Any) -> Any:
+        """Return the cached value, or LRUCache.MISSING when absent or expired"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return self.MISSING
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return self.MISSING
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, key: Any, value: Any, size: int):
+        """Insert a value, evicting least recently used entries to stay within bounds"""
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (time.monotonic() + self.ttl, size, value)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self.entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def _remove(self, key: Any):
+        _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+class LatencyTracker:
+    """Sliding window of request latencies per route"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.samples: Dict[str, Deque[float]] = {}
+        self.counts: Dict[str, int] = {}
+
+    def record(self, route: str, seconds: float):
+        self.samples.setdefault(route, deque(maxlen=self.window)).append(seconds)
+        self.counts[route] = self.counts.get(route, 0) + 1
+
+    @staticmethod
+    def percentile(ordered: list, fraction: float) -> float:
+        """Nearest-rank percentile of an already sorted list"""
+        return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Latency percentiles in milliseconds over the current window, per route"""
+        report = {}
+        for route, samples in self.samples.items():
+            ordered = sorted(samples)
+            report[route] = {
+                'requests': self.counts[route],
+                'window': len(ordered),
+                **{f'p{int(fraction * 100)}_ms': round(self.percentile(ordered, fraction) * 1000, 3)
+                   for fraction in (0.5, 0.9, 0.99)},
+                'max_ms': round(ordered[-1] * 1000, 3)
+            }
+        return report
+
+class F1QueryService:
+    """F1DataReader queries served concurrently from pooled HBase connections"""
+
+    def __init__(self, pool: happybase.ConnectionPool, pool_size: int, cache: LRUCache,
+                 latencies: LatencyTracker):
+        self.pool = pool
+        self.cache = cache
+        self.latencies = latencies
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='hbase')
+        # Cache keys currently being loaded, so concurrent misses share one read
+        self.inflight: Dict[Any, asyncio.Future] = {}
+
+    def _query(self, method: str, *args) -> Any:
+        """Run one F1DataReader query on a pooled connection (executor thread)"""
+        with self.pool.connection() as connection:
+            reader = F1DataReader(connection=connection)
+            return getattr(reader, method)(*args)
+
+    async def query(self, method: str, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(self._query, method, *args))
+
+    async def cached(self, key: Any, load: Callable[[], Awaitable[Any]]) -> bytes:
+        """
+        Encoded JSON body for a cache key, loading and caching it on a miss
+
+        The encoded body is cached rather than the Python value, so a hit
+        skips serialization and the cache is sized by exact response bytes.
+        """
+        body = self.cache.get(key)
+        if body is not LRUCache.MISSING:
+            return body
+        pending = self.inflight.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # The owning request was cancelled, not this one: load it here
+                if not pending.cancelled():
+                    raise
+                return await self.cached(key, load)
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            body = encode(await load())
+            self.cache.put(key, body, len(body))
+            future.set_result(body)
+            return body
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it, mark it retrieved for the owner
+            future.exception()
+            raise
+        finally:
+            # CancelledError is not an Exception, release the waiters anyway
+            if not future.done():
+                future.cancel()
+            del self.inflight[key]
+
+    async def session_index(self, session_key: str) -> Dict[str, Any]:
+        """f1_index entry of a session with row-key ranges decoded, 404 when missing"""
+        index = await self.query('get_session_index', session_key)
+        if index is None:
+            raise web.HTTPNotFound(reason=f"Session {session_key} is not indexed")
+        index['ranges'] = {name: value.decode() for name, value in index['ranges'].items()}
+        return index
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+def encode(value: Any) -> bytes:
+    return json.dumps(value, separators=(',', ':'), default=str).encode()
+
+def json_response(body: bytes) -> web.Response:
+    return web.Response(body=body, content_type='application/json')
+
+@web.middleware
+async def latency_middleware(request: web.Request, handler):
+    """Record every request's latency under its route template"""
+    started = time.perf_counter()
+    try:
+        return await handler(request)
+    finally:
+        resource = request.match_info.route.resource
+        route = resource.canonical if resource is not None else 'unmatched'
+        request.app['service'].latencies.record(f"{request.method} {route}",
+                                                time.perf_counter() - started)
+
+async def get_session(request: web.Request) -> web.Response:
+    service: F1QueryService = request.app['service']
+    session_key = request.match_info['session_key']
+    return json_response(await service.cached(
+        ('session', session_key), lambda: service.session_index(session_key)))
+
+async def get_drivers(request: web.Request) -> web.Response:
+    service: F1QueryService = request.app['service']
+    session_key = request.match_info['session_key']
+    return json_response(await service.cached(
+        ('drivers', session_key), lambda: service.query('fetch_drivers', session_key)))
+
+async def get_summaries(request: web.Request) -> web.Response:
+    service: F1QueryService = request.app['service']
+    session_key = request.match_info['session_key']
+
+    async def load():
+        index = await service.session_index(session_key)
+        year, meeting_key = index['prefix'].split('#')[:2]
+        return await service.query('fetch_driver_summaries', year, meeting_key, session_key)
+
+    return json_response(await service.cached(('summaries', session_key), load))
+
+async def get_records(request: web.Request) -> web.Response:
+    """Random records of a column family, never cached since every sample differs"""
+    service: F1QueryService = request.app['service']
+    session_key = request.match_info['session_key']
+    column_family = request.match_info['column_family']
+    try:
+        count = min(int(request.query.get('count', 10)), CONFIG['max_sample_count'])
+        driver = request.query.get('driver')
+        driver_number = int(driver) if driver is not None else None
+    except ValueError:
+        raise web.HTTPBadRequest(reason="count and driver must be integers")
+    mode = request.query.get('mode', 'seek' if column_family in TIME_SERIES_FAMILIES else 'reservoir')
+    if mode not in ('seek', 'reservoir'):
+        raise web.HTTPBadRequest(reason="mode must be 'seek' or 'reservoir'")
+
+    records = await service.query('fetch_random_records', session_key, column_family,
+                                  count, driver_number, mode)
+    return json_response(encode([{'key': key, 'record': record} for key, record in records]))
+
+async def get_lap_records(request: web.Request) -> web.Response:
+    """Records of a family during a lap range, resolved through the lap index"""
+    service: F1QueryService = request.app['service']
+    session_key = request.match_info['session_key']
+    column_family = request.match_info['column_family']
+    try:
+        lap_start = int(request.match_info['lap_number'])
+        lap_end = int(request.query.get('to', lap_start))
+        driver = request.query.get('driver')
+        driver_number = int(driver) if driver is not None else None
+    except ValueError:
+        raise web.HTTPBadRequest(reason="lap numbers and driver must be integers")
+
+    records = await service.query('fetch_lap_records', session_key, column_family,
+                                  lap_start, lap_end, driver_number)
+    return json_response(encode([{'key': key, 'record': record} for key, record in records]))
+
+async def get_telemetry(request: web.Request) -> web.Response:
+    """Telemetry of a driver over a time range, at the coarsest pyramid level fitting ?resolution="""
+    service: F1QueryService = request.app['service']
+    session_key = request.match_info['session_key']
+    try:
+        driver_number = int(request.match_info['driver_number'])
+        resolution = request.query.get('resolution')
+        resolution = float(resolution) if resolution is not None else None
+    except ValueError:
+        raise web.HTTPBadRequest(reason="driver must be an integer and resolution a number")
+    column_family = request.query.get('family', 'car')
+    if column_family not in TIME_SERIES_FAMILIES:
+        raise web.HTTPBadRequest(reason=f"family must be one of {', '.join(TIME_SERIES_FAMILIES)}")
+
+    family, records = await service.query('fetch_telemetry', session_key, driver_number,
+                                          request.query.get('from'), request.query.get('to'),
+                                          resolution, column_family)
+    return json_response(encode({
+        'family': family,
+        'records': [{'key': key, 'record': record} for key, record in records]
+    }))
+
+async def get_stats(request: web.Request) -> web.Response:
+    service: F1QueryService = request.app['service']
+    return json_response(encode({
+        'cache': service.cache.stats(),
+        'latency': service.latencies.stats(),
+        'inflight': len(service.inflight)
+    }))
+
+def create_app(pool_size: int = CONFIG['pool_size'], host: str = CONFIG['hbase_host'],
+               port: int = CONFIG['hbase_port'], connection_pool=None) -> web.Application:
+    """
+    Build the aiohttp application
+
+    Args:
+        pool_size (int): HBase connections, also the number of executor threads
+        host (str): HBase Thrift host
+        port (int): HBase Thrift port
+        connection_pool: Existing happybase-compatible pool to use instead
+    """
+    app = web.Application(middlewares=[latency_middleware])
+    pool = connection_pool or happybase.ConnectionPool(pool_size, host=host, port=port)
+    app['service'] = F1QueryService(
+        pool, pool_size,
+        LRUCache(CONFIG['cache_max_entries'], CONFIG['cache_max_bytes'], CONFIG['cache_ttl']),
+        LatencyTracker(CONFIG['latency_window'])
+    )
+
+    async def on_cleanup(app: web.Application):
+        app['service'].close()
+
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_get('/sessions/{session_key}', get_session)
+    app.router.add_get('/sessions/{session_key}/drivers', get_drivers)
+    app.router.add_get('/sessions/{session_key}/summaries', get_summaries)
+    app.router.add_get('/sessions/{session_key}/records/{column_family}', get_records)
+    app.router.add_get('/sessions/{session_key}/laps/{lap_number}/{column_family}', get_lap_records)
+    app.router.add_get('/sessions/{session_key}/telemetry/{driver_number}', get_telemetry)
+    app.router.add_get('/stats', get_stats)
+    return app
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve F1 HBase queries over HTTP")
+    parser.add_argument('--listen', default='127.0.0.1', help="Address to bind")
+    parser.add_argument('--port', type=int, default=8080, help="Port to bind")
+    parser.add_argument('--hbase-host', default=CONFIG['hbase_host'], help="HBase Thrift host")
+    parser.add_argument('--hbase-port', type=int, default=CONFIG['hbase_port'],
+                        help="HBase Thrift port")
+    parser.add_argument('--pool-size', type=int, default=CONFIG['pool_size'],
+                        help="Pooled HBase connections (and concurrent HBase reads)")
+    parser.add_argument('--cache-entries', type=int, default=CONFIG['cache_max_entries'],
+                        help="Maximum cached responses")
+    parser.add_argument('--cache-mb', type=int, default=CONFIG['cache_max_bytes'] // (1024 * 1024),
+                        help="Maximum cached response size in MB")
+    parser.add_argument('--cache-ttl', type=float, default=CONFIG['cache_ttl'],
+                        help="Seconds a cached response stays valid")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    CONFIG.update({
+        'cache_max_entries': args.cache_entries,
+        'cache_max_bytes': args.cache_mb * 1024 * 1024,
+        'cache_ttl': args.cache_ttl
+    })
+    app = create_app(args.pool_size, args.hbase_host, args.hbase_port)
+    logging.info(f"Serving F1 queries on {args.listen}:{args.port} "
+                 f"({args.pool_size} HBase connections to {args.hbase_host}:{args.hbase_port})")
+    web.run_app(app, host=args.listen, port=args.port)
+
+if __name__ == "__main__":
+    main()
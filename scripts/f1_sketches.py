@@ -0,0 +1,271 @@
+"""
+Mergeable sketches for approximate F1 telemetry analytics.
+
+Sketches are built once per driver and session by the ingester, stored as
+JSON strings in the `sketch` column family of `f1_summary`, and merged on
+demand to answer quantile and distinct-count questions across any number of
+sessions without rescanning raw telemetry.
+"""
+import base64
+import hashlib
+import json
+import math
+import random
+from typing import Any, Dict, Iterable, List, Optional
+
+class KLLSketch:
+    """
+    KLL quantile sketch.
+
+    Keeps a hierarchy of compactors whose capacity shrinks geometrically with
+    depth. Items at level h stand for 2**h original values. Rank error is
+    roughly 1.7 / k with high probability, independent of the stream length.
+    """
+
+    def __init__(self, k: int = 200):
+        """
+        Initialize an empty sketch
+
+        Args:
+            k (int): Accuracy parameter, capacity of the top compactor
+        """
+        self.k = k
+        self.n = 0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+        self.compactors: List[List[float]] = [[]]
+        self.size = 0
+        self.max_size = 0
+        self._update_max_size()
+
+    def _capacity(self, level: int) -> int:
+        """Capacity of the compactor at the given level"""
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.k * (2 / 3) ** depth)) + 1
+
+    def _update_max_size(self):
+        """Recompute the total number of items kept before compacting"""
+        self.max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def update(self, value: Any):
+        """Add a value to the sketch, ignoring missing or non-numeric values"""
+        if value is None:
+            return
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return
+        self.n += 1
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        self.compactors[0].append(value)
+        self.size += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def _compress(self):
+        """Compact the first over-full level, promoting half its items"""
+        for level in range(len(self.compactors)):
+            if len(self.compactors[level]) >= self._capacity(level):
+                if level + 1 >= len(self.compactors):
+                    self.compactors.append([])
+                    self._update_max_size()
+                items = sorted(self.compactors[level])
+                # Keep an odd leftover at this level so weight is preserved exactly
+                leftover = [items.pop()] if len(items) % 2 else []
+                offset = random.randint(0, 1)
+                self.compactors[level + 1].extend(items[offset::2])
+                self.compactors[level] = leftover
+                self.size = sum(len(compactor) for compactor in self.compactors)
+                if self.size < self.max_size:
+                    break
+
+    def merge(self, other: 'KLLSketch') -> 'KLLSketch':
+        """Merge another sketch into this one in place"""
+        if other.n == 0:
+            return self
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        self._update_max_size()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        if self.minimum is None or (other.minimum is not None and other.minimum < self.minimum):
+            self.minimum = other.minimum
+        if self.maximum is None or (other.maximum is not None and other.maximum > self.maximum):
+            self.maximum = other.maximum
+        self.size = sum(len(compactor) for compactor in self.compactors)
+        while self.size >= self.max_size:
+            self._compress()
+        return self
+
+    def quantiles(self, fractions: Iterable[float]) -> List[Optional[float]]:
+        """
+        Estimate several quantiles at once
+
+        Args:
+            fractions (Iterable[float]): Quantile ranks in [0, 1]
+
+        Returns:
+            List[Optional[float]]: Estimated values, None when the sketch is empty
+        """
+        fractions = list(fractions)
+        if self.n == 0:
+            return [None] * len(fractions)
+        weighted = sorted(
+            (value, 2 ** level)
+            for level, items in enumerate(self.compactors)
+            for value in items
+        )
+        total = sum(weight for _, weight in weighted)
+        results = []
+        for fraction in fractions:
+            if fraction <= 0:
+                results.append(self.minimum)
+                continue
+            if fraction >= 1:
+                results.append(self.maximum)
+                continue
+            target = fraction * total
+            cumulative = 0
+            estimate = weighted[-1][0]
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    estimate = value
+                    break
+            results.append(estimate)
+        return results
+
+    def to_json(self) -> str:
+        """Serialize the sketch for storage in an HBase cell"""
+        return json.dumps({
+            'type': 'kll',
+            'k': self.k,
+            'n': self.n,
+            'min': self.minimum,
+            'max': self.maximum,
+            'compactors': self.compactors
+        }, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, payload: str) -> 'KLLSketch':
+        """Rebuild a sketch serialized with to_json()"""
+        state = json.loads(payload)
+        sketch = cls(state['k'])
+        sketch.n = state['n']
+        sketch.minimum = state['min']
+        sketch.maximum = state['max']
+        sketch.compactors = state['compactors'] or [[]]
+        sketch.size = sum(len(compactor) for compactor in sketch.compactors)
+        sketch._update_max_size()
+        return sketch
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter.
+
+    Uses 2**precision one-byte registers. Standard error is about
+    1.04 / sqrt(2**precision), i.e. ~1.6% for the default precision of 12.
+    """
+
+    def __init__(self, precision: int = 12):
+        """
+        Initialize an empty counter
+
+        Args:
+            precision (int): Number of index bits, between 4 and 16
+        """
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def update(self, value: Any):
+        """Add a value to the counter, ignoring missing values"""
+        if value is None:
+            return
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        remainder = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """Merge another counter of the same precision into this one in place"""
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLog of precision {other.precision} into {self.precision}")
+        self.registers = bytearray(
+            left if left >= right else right
+            for left, right in zip(self.registers, other.registers)
+        )
+        return self
+
+    def count(self) -> int:
+        """Estimate the number of distinct values seen"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        # Linear counting is more accurate for small cardinalities
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_json(self) -> str:
+        """Serialize the counter for storage in an HBase cell"""
+        return json.dumps({
+            'type': 'hll',
+            'p': self.precision,
+            'registers': base64.b64encode(bytes(self.registers)).decode()
+        }, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, payload: str) -> 'HyperLogLog':
+        """Rebuild a counter serialized with to_json()"""
+        state = json.loads(payload)
+        counter = cls(state['p'])
+        counter.registers = bytearray(base64.b64decode(state['registers']))
+        return counter
+
+def load_sketch(payload: str):
+    """Deserialize a sketch of any supported type"""
+    sketch_type = json.loads(payload)['type']
+    if sketch_type == 'kll':
+        return KLLSketch.from_json(payload)
+    if sketch_type == 'hll':
+        return HyperLogLog.from_json(payload)
+    raise ValueError(f"Unknown sketch type: {sketch_type}")
+
+def merge_sketches(payloads: Iterable[str]):
+    """
+    Merge serialized sketches of the same type
+
+    Returns:
+        The merged sketch, or None when no payloads are given
+    """
+    merged = None
+    for payload in payloads:
+        sketch = load_sketch(payload)
+        merged = sketch if merged is None else merged.merge(sketch)
+    return merged
+
+def summarize_sketches(sketches: Dict[str, Any], fractions=(0.5, 0.9, 0.99)) -> Dict[str, Any]:
+    """
+    Flatten merged sketches into a single result row
+
+    KLL sketches produce '<name>_p50'-style columns plus exact min/max,
+    HyperLogLog counters produce a '<name>_distinct' column.
+    """
+    row = {}
+    for name, sketch in sketches.items():
+        if isinstance(sketch, KLLSketch):
+            for fraction, value in zip(fractions, sketch.quantiles(fractions)):
+                row[f"{name}_p{int(round(fraction * 100))}"] = value
+            row[f"{name}_min"] = sketch.minimum
+            row[f"{name}_max"] = sketch.maximum
+        elif isinstance(sketch, HyperLogLog):
+            row[f"{name}_distinct"] = sketch.count()
+    return row
@@ -9,6 +9,7 @@ import happybase
 import time
 from datetime import datetime, timedelta
 import json
+import hashlib
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass
 import sys
@@ -16,6 +17,9 @@ import traceback
 from colorama import Fore, Style, init
 import logging
 from functools import partial
+from f1_sketches import KLLSketch, HyperLogLog
+from f1_pyramid import PYRAMID_FAMILIES, TelemetryPyramid
+from f1_codec import FINGERPRINT_QUALIFIER, CellEncoder, json_loads
 
 # Initialize colorama for colored console output
 init()
@@ -34,7 +38,8 @@ CONFIG = {
     "request_timeout": 60,     # Request timeout in seconds
     "delay_between_requests": 1,  # Delay between consecutive requests
     "max_concurrent_requests": 10,  # Maximum number of concurrent requests
-    "time_interval": 900       # Time interval for data collection (15 minutes)
+    "time_interval": 900,      # Time interval for data collection (15 minutes)
+    "initialize_tables": True  # Recreate tables on start, False to re-ingest incrementally
 }
 
 # API configuration
@@ -60,6 +65,12 @@ TIME_SERIES_ENDPOINTS = ['car_data', 'location']
 DRIVER_SPECIFIC_ENDPOINTS = ['car_data', 'intervals', 'laps', 'location', 'pit', 'position', 'stints', 'team_radio']
 GLOBAL_ENDPOINTS = ['drivers', 'race_control', 'weather']
 
+# f1_data column families written under a driver's row prefix
+DRIVER_COLUMN_FAMILIES = [
+    'car' if endpoint == 'car_data' else endpoint.replace('_', '')
+    for endpoint in DRIVER_SPECIFIC_ENDPOINTS
+] + list(PYRAMID_FAMILIES)
+
 @dataclass
 class Stats:
     """Class for tracking statistics during data collection"""
@@ -67,6 +78,8 @@ class Stats:
     sessions_processed: int = 0
     total_requests: int = 0
     failed_requests: int = 0
+    rows_written: int = 0
+    rows_skipped: int = 0
     start_time: float = 0
     endpoint_stats: Dict[str, Dict[str, int]] = None
 
@@ -78,6 +91,221 @@ class Stats:
                 for endpoint in ENDPOINTS.keys()
             }
 
+@dataclass
+class Accumulator:
+    """Mergeable count/sum/min/max accumulator for one numeric field"""
+    count: int = 0
+    total: float = 0.0
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+
+    def add(self, value: Any):
+        """Fold a raw API value into the accumulator, ignoring missing values"""
+        if value is None:
+            return
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def to_columns(self, name: str) -> Dict[str, Any]:
+        """Flatten the accumulator into '<name>_<stat>' qualifiers"""
+        return {
+            f"{name}_count": self.count,
+            f"{name}_sum": self.total,
+            f"{name}_min": "" if self.minimum is None else self.minimum,
+            f"{name}_max": "" if self.maximum is None else self.maximum
+        }
+
+class DriverRollup:
+    """Per-driver, per-session summary accumulators maintained during ingestion"""
+
+    DRS_OPEN_VALUES = (10, 12, 14)
+    SECTORS = ('duration_sector_1', 'duration_sector_2', 'duration_sector_3')
+
+    def __init__(self):
+        self.speed = Accumulator()
+        self.rpm = Accumulator()
+        self.throttle = Accumulator()
+        self.lap_duration = Accumulator()
+        self.sectors = {sector: Accumulator() for sector in self.SECTORS}
+        self.pit_duration = Accumulator()
+        self.drs_samples = 0
+        self.drs_activations = 0
+        self.laps_recorded = 0
+        # Mergeable sketches for approximate distribution queries
+        self.sketches = {
+            'speed': KLLSketch(),
+            'rpm': KLLSketch(),
+            'throttle': KLLSketch(),
+            'samples': HyperLogLog()
+        }
+
+    def observe(self, column_family: str, item: Dict[str, Any]):
+        """
+        Update accumulators with a record that is being written to HBase
+
+        Args:
+            column_family (str): Column family the record is stored under
+            item (Dict): Raw record from the OpenF1 API
+        """
+        if column_family == 'car':
+            self.speed.add(item.get('speed'))
+            self.rpm.add(item.get('rpm'))
+            self.throttle.add(item.get('throttle'))
+            self.sketches['speed'].update(item.get('speed'))
+            self.sketches['rpm'].update(item.get('rpm'))
+            self.sketches['throttle'].update(item.get('throttle'))
+            self.sketches['samples'].update(item.get('date'))
+            drs = item.get('drs')
+            if drs is not None:
+                self.drs_samples += 1
+                if drs in self.DRS_OPEN_VALUES:
+                    self.drs_activations += 1
+        elif column_family == 'laps':
+            self.laps_recorded += 1
+            self.lap_duration.add(item.get('lap_duration'))
+            # Sector averages only use laps with all three sectors timed
+            if all(item.get(sector) is not None for sector in self.SECTORS):
+                for sector in self.SECTORS:
+                    self.sectors[sector].add(item.get(sector))
+        elif column_family == 'pit':
+            self.pit_duration.add(item.get('pit_duration'))
+
+    def to_columns(self) -> Dict[str, Any]:
+        """Flatten all accumulators into a single HBase row"""
+        columns = {
+            'drs_samples': self.drs_samples,
+            'drs_activations': self.drs_activations,
+            'laps_recorded': self.laps_recorded
+        }
+        columns.update(self.speed.to_columns('speed'))
+        columns.update(self.rpm.to_columns('rpm'))
+        columns.update(self.throttle.to_columns('throttle'))
+        columns.update(self.lap_duration.to_columns('lap_duration'))
+        columns.update(self.pit_duration.to_columns('pit_duration'))
+        for sector, accumulator in self.sectors.items():
+            columns.update(accumulator.to_columns(sector))
+        return columns
+
+    def to_sketch_columns(self) -> Dict[str, str]:
+        """Serialize sketches, one qualifier per channel"""
+        return {name: sketch.to_json() for name, sketch in self.sketches.items()}
+
+class SessionIndex:
+    """Secondary index entry for one session, maintained during ingestion"""
+
+    def __init__(self, year: int, meeting_key: int, session: Dict[str, Any]):
+        """
+        Initialize the index entry
+
+        Args:
+            year (int): Racing year
+            meeting_key (int): Meeting identifier
+            session (Dict): Session data
+        """
+        self.year = year
+        self.meeting_key = meeting_key
+        self.session = session
+        self.prefix = f"{year}#{meeting_key}#{session['session_key']}"
+        self.drivers: Dict[str, Dict[str, Any]] = {}
+        self.ranges: Dict[str, List[str]] = {}
+        # driver_number -> lap_number -> (date_start, lap_duration)
+        self.laps: Dict[str, Dict[int, Tuple[str, Any]]] = {}
+
+    def add_driver(self, driver: Dict[str, Any]):
+        """Record a driver taking part in the session"""
+        self.drivers[str(driver['driver_number'])] = driver
+
+    def observe(self, column_family: str, row_key: str, item: Optional[Dict[str, Any]] = None):
+        """
+        Widen the [first, last] row-key range of a column family
+
+        Args:
+            column_family (str): Column family the row was stored under
+            row_key (str): Row key that was written
+            item (Dict, optional): Stored record, laps records feed the lap index
+        """
+        bounds = self.ranges.get(column_family)
+        if bounds is None:
+            self.ranges[column_family] = [row_key, row_key]
+        elif row_key < bounds[0]:
+            bounds[0] = row_key
+        elif row_key > bounds[1]:
+            bounds[1] = row_key
+        if column_family == 'laps' and item is not None:
+            self.observe_lap(item.get('driver_number') or row_key.split('#')[3], item)
+
+    def observe_lap(self, driver_number: Any, lap: Dict[str, Any]):
+        """Record a lap's start time, laps without lap_number or date_start are not indexed"""
+        if lap.get('lap_number') is None or not lap.get('date_start'):
+            return
+        self.laps.setdefault(str(driver_number), {})[int(lap['lap_number'])] = (
+            lap['date_start'], lap.get('lap_duration')
+        )
+
+    def driver_lap_windows(self, driver_number: Any) -> Dict[int, Tuple[str, str]]:
+        """
+        [date_start, date_end) of each recorded lap of a driver
+
+        A lap ends where the driver's next lap starts. The last lap, or a lap
+        followed by a gap in lap numbers, ends after its lap_duration, or at the
+        end of the session when it has none.
+        """
+        laps = self.laps.get(str(driver_number), {})
+        numbers = sorted(laps)
+        windows = {}
+        for position, lap_number in enumerate(numbers):
+            date_start, lap_duration = laps[lap_number]
+            if position + 1 < len(numbers) and numbers[position + 1] == lap_number + 1:
+                date_end = laps[lap_number + 1][0]
+            elif lap_duration is not None:
+                started = datetime.fromisoformat(date_start.replace('Z', '+00:00'))
+                date_end = (started + timedelta(seconds=float(lap_duration))).isoformat()
+            else:
+                date_end = self.session.get('date_end')
+            if date_end:
+                windows[lap_number] = (date_start, date_end)
+        return windows
+
+    def lap_windows(self) -> Dict[str, str]:
+        """Lap index cells, '{driver_number}#{lap_number}' -> JSON [date_start, date_end)"""
+        return {
+            f"{driver_number}#{lap_number}": json.dumps(list(window))
+            for driver_number in self.laps
+            for lap_number, window in self.driver_lap_windows(driver_number).items()
+        }
+
+    def to_columns(self) -> Dict[str, Dict[str, Any]]:
+        """Index cells grouped by column family"""
+        ranges = {}
+        for column_family, (first, last) in self.ranges.items():
+            ranges[f"{column_family}_first"] = first
+            ranges[f"{column_family}_last"] = last
+        return {
+            'session': {
+                'year': self.year,
+                'meeting_key': self.meeting_key,
+                'prefix': self.prefix,
+                'session_type': self.session.get('session_type'),
+                'session_name': self.session.get('session_name'),
+                'date_start': self.session.get('date_start'),
+                'date_end': self.session.get('date_end')
+            },
+            'drivers': {
+                driver_number: json.dumps(driver)
+                for driver_number, driver in self.drivers.items()
+            },
+            'ranges': ranges,
+            'laps': self.lap_windows()
+        }
+
 class Logger:
     """Custom logger class for formatted console output"""
     
@@ -158,7 +386,7 @@ class RequestQueue:
                             continue
 
                         response.raise_for_status()
-                        data = await response.json()
+                        data = await response.json(loads=json_loads)
                         self.stats.total_requests += 1
                         self.stats.endpoint_stats[endpoint]['success'] += 1
                         Logger.success(f"Received data: {len(data) if isinstance(data, list) else 1} items")
@@ -178,7 +406,8 @@ class RequestQueue:
 class HBaseConnector:
     """Handles connections and operations with HBase database"""
     
-    def __init__(self, host='localhost', port=9090, initialize_tables=False):
+    def __init__(self, host='localhost', port=9090, initialize_tables=False, connection=None,
+                 stats: Optional[Stats] = None):
         """
         Initialize HBase connection
         
@@ -186,25 +415,33 @@ class HBaseConnector:
             host (str): HBase host address
             port (int): HBase port number
             initialize_tables (bool): Whether to initialize database tables
+            connection (optional): Existing happybase-compatible connection to use instead
+            stats (Stats, optional): Statistics receiving written and skipped row counts
         """
-        self.connection = happybase.Connection(host=host, port=port)
+        self.connection = connection or happybase.Connection(host=host, port=port)
+        self.stats = stats or Stats()
+        self.encoder = CellEncoder()
+        # (table, row_key, column_family) -> stored fingerprint, see load_fingerprints
+        self.fingerprints: Dict[Tuple[str, str, str], bytes] = {}
         if initialize_tables:
             self.initialize_tables()
 
     def initialize_tables(self):
         """
         Initialize HBase tables with appropriate column families.
-        Creates two tables:
+        Creates four tables:
         - f1_data: Stores all F1 racing data
         - f1_reports: Stores metadata, statistics and error reports
+        - f1_summary: Stores per-session, per-driver rollups built at ingest time
+        - f1_index: Maps session_key to its row-key prefix, drivers, family ranges
+          and per-lap time windows
         """
         try:
             # Remove existing tables if they exist
             existing_tables = self.connection.tables()
-            if b'f1_data' in existing_tables:
-                self.connection.delete_table('f1_data', disable=True)
-            if b'f1_reports' in existing_tables:
-                self.connection.delete_table('f1_reports', disable=True)
+            for table_name in ('f1_data', 'f1_reports', 'f1_summary', 'f1_index'):
+                if table_name.encode() in existing_tables:
+                    self.connection.delete_table(table_name, disable=True)
 
             # Create main data table with column families
             self.connection.create_table(
@@ -218,6 +455,9 @@ class HBaseConnector:
                     'meeting': dict(),
                     'pit': dict(),
                     'position': dict(),
+                    'pyramid10s': dict(),
+                    'pyramid1s': dict(),
+                    'pyramidlap': dict(),
                     'racecontrol': dict(),
                     'session': dict(),
                     'stints': dict(),
@@ -236,41 +476,116 @@ class HBaseConnector:
                 }
             )
 
+            # Create summary table, keyed by {year}#{meeting_key}#{session_key}#{driver_number}
+            self.connection.create_table(
+                'f1_summary',
+                {
+                    'rollup': dict(),
+                    'sketch': dict()
+                }
+            )
+
+            # Create session index table, keyed by session_key
+            self.connection.create_table(
+                'f1_index',
+                {
+                    'session': dict(),
+                    'drivers': dict(),
+                    'ranges': dict(),
+                    'laps': dict()
+                }
+            )
+
             Logger.success("HBase tables initialized successfully")
         except Exception as e:
             Logger.error(f"Error initializing tables: {str(e)}")
             raise
 
+    @staticmethod
+    def fingerprint(columns: Dict[bytes, bytes]) -> bytes:
+        """Order-independent 64-bit content hash of encoded cells"""
+        digest = hashlib.blake2b(digest_size=8)
+        for qualifier in sorted(columns):
+            digest.update(qualifier)
+            digest.update(b'\x00')
+            digest.update(columns[qualifier])
+            digest.update(b'\x01')
+        return digest.hexdigest().encode()
+
+    def load_fingerprints(self, table: str, column_families: List[str],
+                          row_prefix: Optional[str] = None, row_keys: Optional[List[str]] = None):
+        """
+        Prefetch stored fingerprints so store_data can skip unchanged rows
+
+        Only the `<family>:_fp` cells are read, with one scan under row_prefix
+        or one multi-row get for row_keys. Rows that were not prefetched are
+        always written.
+
+        Args:
+            table (str): Table name
+            column_families (List[str]): Column families about to be written
+            row_prefix (str, optional): Prefix of the rows about to be written
+            row_keys (List[str], optional): Exact keys of the rows about to be written
+        """
+        table_obj = self.connection.table(table)
+        columns = [
+            f"{column_family.replace('_', '').lower()}:{FINGERPRINT_QUALIFIER}".encode()
+            for column_family in column_families
+        ]
+        if row_keys is not None:
+            rows = table_obj.rows([key.encode() for key in row_keys], columns=columns)
+        else:
+            rows = table_obj.scan(row_prefix=row_prefix.encode(), columns=columns)
+        for key, data in rows:
+            row_key = key.decode()
+            for column, value in data.items():
+                self.fingerprints[(table, row_key, column.split(b':', 1)[0].decode())] = value
+
+    def clear_fingerprints(self):
+        """Drop prefetched fingerprints once their rows have been written"""
+        self.fingerprints = {}
+
     def store_data(self, table: str, row_key: str, data: Dict[str, Any],
-                   column_family: str, metadata: Optional[Dict] = None):
+                   column_family: str, metadata: Optional[Dict] = None) -> bool:
         """
         Store data in HBase table
         
+        The row's cells get a content fingerprint under `<family>:_fp`. When
+        the fingerprint prefetched by load_fingerprints is identical, the put
+        is skipped, so re-ingesting unchanged records creates no new versions.
+        
         Args:
             table (str): Table name
             row_key (str): Unique row identifier
             data (Dict): Data to store
             column_family (str): Column family name
-            metadata (Dict, optional): Additional metadata to store
+            metadata (Dict, optional): Additional metadata to store, not fingerprinted
+            
+        Returns:
+            bool: False when the put was skipped as unchanged
         """
         try:
             table_obj = self.connection.table(table)
-            column_family = column_family.replace('_', '').lower()
-            
-            # Convert data values to string and encode
-            columns = {
-                f"{column_family}:{key}".encode(): str(value).encode()
-                for key, value in data.items()
-            }
+            column_family = self.encoder.family(column_family)
+
+            # Encode values as str(value).encode() under cached qualifiers
+            columns = self.encoder.encode(column_family, data)
+
+            fingerprint = self.fingerprint(columns)
+            if self.fingerprints.get((table, row_key, column_family)) == fingerprint:
+                self.stats.rows_skipped += 1
+                return False
+            columns[self.encoder.qualifier(column_family, FINGERPRINT_QUALIFIER)] = fingerprint
 
             # Add metadata if provided
             if metadata:
-                columns.update({
-                    f"{column_family}:_meta_{key}".encode(): str(value).encode()
-                    for key, value in metadata.items()
-                })
+                columns.update(self.encoder.encode_metadata(column_family, metadata))
 
             table_obj.put(row_key.encode(), columns)
+            # Later writes to the same row in this run compare against this one
+            self.fingerprints[(table, row_key, column_family)] = fingerprint
+            self.stats.rows_written += 1
+            return True
 
         except Exception as e:
             Logger.error(f"Error storing data in HBase: {str(e)}")
@@ -290,7 +605,7 @@ class F1DataCollector:
         """
         self.stats = Stats()
         self.queue = RequestQueue()
-        self.hbase = HBaseConnector(hbase_host, hbase_port, initialize_tables)
+        self.hbase = HBaseConnector(hbase_host, hbase_port, initialize_tables, stats=self.stats)
         self.stats.start_time = time.time()
 
     def generate_row_key(self, *components) -> str:
@@ -298,7 +613,10 @@ class F1DataCollector:
         return "#".join(map(str, components))
 
     async def fetch_time_series_data(self, year: int, meeting_key: int, session_key: int,
-                                   driver_number: int, endpoint: str) -> None:
+                                   driver_number: int, endpoint: str,
+                                   rollup: Optional[DriverRollup] = None,
+                                   index: Optional[SessionIndex] = None,
+                                   pyramid: Optional[TelemetryPyramid] = None) -> None:
         """
         Fetch time series data for a specific driver and session
         
@@ -308,6 +626,9 @@ class F1DataCollector:
             session_key (int): Session identifier
             driver_number (int): Driver's number
             endpoint (str): API endpoint name
+            rollup (DriverRollup, optional): Summary accumulators to update while storing
+            index (SessionIndex, optional): Session index to update while storing
+            pyramid (TelemetryPyramid, optional): Downsampled telemetry to update while storing
         """
         try:
             # Get session timing information
@@ -322,6 +643,8 @@ class F1DataCollector:
             current_time = session_start
             chunk_count = 0
 
+            column_family = 'car' if endpoint == 'car_data' else endpoint.replace('_', '')
+
             # Collect data in time intervals
             while current_time < session_end:
                 next_time = min(current_time + timedelta(seconds=CONFIG['time_interval']), session_end)
@@ -346,13 +669,19 @@ class F1DataCollector:
                                 'f1_data',
                                 row_key,
                                 item,
-                                'car' if endpoint == 'car_data' else endpoint.replace('_', ''),
+                                column_family,
                                 {
                                     'chunk_index': chunk_count,
                                     'time_window_start': current_time.isoformat(),
                                     'time_window_end': next_time.isoformat()
                                 }
                             )
+                            if rollup:
+                                rollup.observe(column_family, item)
+                            if index:
+                                index.observe(column_family, row_key)
+                            if pyramid:
+                                pyramid.observe(column_family, item)
 
                         chunk_count += 1
 
@@ -379,31 +708,55 @@ class F1DataCollector:
             session_key = session['session_key']
             Logger.progress(f"Processing session {session['session_name']}")
 
-            # Store session data
+            index = SessionIndex(year, meeting_key, session)
+            global_endpoints = [endpoint for endpoint in GLOBAL_ENDPOINTS if endpoint != 'drivers']
+
+            # Prefetch the session-level fingerprints so unchanged rows are not rewritten
             row_key = self.generate_row_key(year, meeting_key, session_key)
+            self.hbase.clear_fingerprints()
+            self.hbase.load_fingerprints(
+                'f1_data', ['session'] + global_endpoints,
+                row_keys=[row_key] + [
+                    self.generate_row_key(year, meeting_key, session_key, endpoint)
+                    for endpoint in global_endpoints
+                ]
+            )
+
+            # Store session data
             self.hbase.store_data('f1_data', row_key, session, 'session')
+            index.observe('session', row_key)
 
             # Get list of drivers in the session
             drivers = await self.queue.make_request(f"{BASE_URL}/drivers?session_key={session_key}")
+            for driver in drivers:
+                index.add_driver(driver)
 
             # Process global endpoints (not driver-specific)
-            for endpoint in GLOBAL_ENDPOINTS:
-                if endpoint != 'drivers':
-                    data = await self.queue.make_request(f"{BASE_URL}{ENDPOINTS[endpoint]}?session_key={session_key}")
-                    if data:
-                        endpoint_key = self.generate_row_key(year, meeting_key, session_key, endpoint)
-                        self.hbase.store_data('f1_data', endpoint_key, {'data': data}, endpoint.replace('_', ''))
-                    await asyncio.sleep(CONFIG['delay_between_requests'])
+            for endpoint in global_endpoints:
+                data = await self.queue.make_request(f"{BASE_URL}{ENDPOINTS[endpoint]}?session_key={session_key}")
+                if data:
+                    endpoint_key = self.generate_row_key(year, meeting_key, session_key, endpoint)
+                    self.hbase.store_data('f1_data', endpoint_key, {'data': data}, endpoint.replace('_', ''))
+                    index.observe(endpoint.replace('_', ''), endpoint_key)
+                await asyncio.sleep(CONFIG['delay_between_requests'])
 
             # Process driver-specific data
             for driver in drivers:
                 driver_number = driver['driver_number']
                 Logger.progress(f"Processing driver {driver_number}")
+                rollup = DriverRollup()
+                pyramid = TelemetryPyramid(driver_number)
+
+                # One fingerprint scan over the driver's rows, one get for its summary
+                driver_key = self.generate_row_key(year, meeting_key, session_key, driver_number)
+                self.hbase.clear_fingerprints()
+                self.hbase.load_fingerprints('f1_data', DRIVER_COLUMN_FAMILIES, row_prefix=f"{driver_key}#")
+                self.hbase.load_fingerprints('f1_summary', ['rollup', 'sketch'], row_keys=[driver_key])
 
                 # Handle time series data
                 for endpoint in TIME_SERIES_ENDPOINTS:
                     await self.fetch_time_series_data(
-                        year, meeting_key, session_key, driver_number, endpoint
+                        year, meeting_key, session_key, driver_number, endpoint, rollup, index, pyramid
                     )
                     await asyncio.sleep(CONFIG['delay_between_requests'])
 
@@ -422,8 +775,37 @@ class F1DataCollector:
                                     item.get('lap_number') or item.get('time')
                                 )
                                 self.hbase.store_data('f1_data', row_key, item, column_family)
+                                rollup.observe(column_family, item)
+                                index.observe(column_family, row_key, item)
                         await asyncio.sleep(CONFIG['delay_between_requests'])
 
+                # Write the downsampled telemetry levels once the driver's laps are known
+                for column_family, key, cells in pyramid.rows(index.driver_lap_windows(driver_number)):
+                    row_key = self.generate_row_key(year, meeting_key, session_key, driver_number, key)
+                    self.hbase.store_data('f1_data', row_key, cells, column_family)
+                    index.observe(column_family, row_key)
+
+                # Write the driver's session summary once all its rows are stored
+                summary = {
+                    'year': year,
+                    'meeting_key': meeting_key,
+                    'session_key': session_key,
+                    'session_type': session.get('session_type'),
+                    'driver_number': driver_number
+                }
+                summary.update(rollup.to_columns())
+                self.hbase.store_data('f1_summary', driver_key, summary, 'rollup')
+                self.hbase.store_data('f1_summary', driver_key, rollup.to_sketch_columns(), 'sketch')
+
+            # Publish the session index once every row of the session is stored
+            index_columns = index.to_columns()
+            self.hbase.clear_fingerprints()
+            self.hbase.load_fingerprints('f1_index', list(index_columns), row_keys=[str(session_key)])
+            for column_family, columns in index_columns.items():
+                if columns:
+                    self.hbase.store_data('f1_index', str(session_key), columns, column_family)
+            self.hbase.clear_fingerprints()
+
             self.stats.sessions_processed += 1
 
         except Exception as e:
@@ -433,7 +815,8 @@ class F1DataCollector:
 class ParallelF1DataCollector:
     """Handles parallel processing of F1 data collection"""
     
-    def __init__(self, hbase_host='localhost', hbase_port=9090, num_processes=None):
+    def __init__(self, hbase_host='localhost', hbase_port=9090, num_processes=None,
+                 initialize_tables=CONFIG['initialize_tables']):
         """
         Initialize parallel collector
         
@@ -441,6 +824,8 @@ class ParallelF1DataCollector:
             hbase_host (str): HBase host address
             hbase_port (int): HBase port number
             num_processes (int, optional): Number of parallel processes
+            initialize_tables (bool): Recreate the tables; keep them to re-ingest
+                incrementally, skipping unchanged rows
         """
         self.stats = Stats()
         self.hbase_host = hbase_host
@@ -449,7 +834,7 @@ class ParallelF1DataCollector:
         self.stats.start_time = time.time()
         
         # Initialize HBase tables in main process
-        self.main_collector = F1DataCollector(hbase_host, hbase_port, initialize_tables=True)
+        self.main_collector = F1DataCollector(hbase_host, hbase_port, initialize_tables=initialize_tables)
 
     def display_stats(self):
         """Display current execution statistics"""
@@ -463,6 +848,8 @@ class ParallelF1DataCollector:
         Logger.stats(f"Sessions processed: {self.stats.sessions_processed}")
         Logger.stats(f"Total requests: {self.stats.total_requests}")
         Logger.stats(f"Failed requests: {self.stats.failed_requests}")
+        Logger.stats(f"Rows written: {self.stats.rows_written}")
+        Logger.stats(f"Rows skipped (unchanged): {self.stats.rows_skipped}")
         Logger.stats(f"Number of processes: {self.num_processes}")
 
         Logger.stats("\nEndpoint statistics:")
@@ -505,6 +892,8 @@ class ParallelF1DataCollector:
                         self.stats.sessions_processed += stats["sessions_processed"]
                         self.stats.total_requests += stats["total_requests"]
                         self.stats.failed_requests += stats["failed_requests"]
+                        self.stats.rows_written += stats.get("rows_written", 0)
+                        self.stats.rows_skipped += stats.get("rows_skipped", 0)
                         
                         for endpoint, values in stats["endpoint_stats"].items():
                             self.stats.endpoint_stats[endpoint]["success"] += values["success"]
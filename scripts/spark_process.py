@@ -1,10 +1,23 @@
-from pyspark.sql import SparkSession
+from pyspark import StorageLevel
+from pyspark.sql import SparkSession, DataFrame, Column
 from pyspark.sql.functions import *
 from pyspark.sql.types import *
 import happybase
+import argparse
+import builtins
 import json
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import logging
+import urllib.request
+from f1_codec import FINGERPRINT_QUALIFIER
+from f1_sketches import merge_sketches, summarize_sketches
+from f1_pyramid import COARSEST_RESOLUTION, PYRAMID_FAMILIES, pick_level
 
 # Configure logging
 logging.basicConfig(
@@ -20,203 +33,981 @@ def create_spark_session():
             .config("spark.sql.extensions", "org.apache.spark.sql.hbase")
             .getOrCreate())
 
-def fetch_data_from_hbase(connection, table_name, column_family):
-    """Fetch data from HBase and convert to list of dictionaries"""
+# Tables whose row keys end at the driver number instead of continuing with '#'
+DRIVER_TERMINATED_TABLES = ('f1_summary',)
+
+@dataclass
+class AnalysisScope:
+    """
+    Subset of the data selected by row-key components
+
+    Row keys are laid out as {year}#{meeting_key}#{session_key}#{driver_number}#...,
+    so every leading component that is known narrows the HBase scan to a
+    row prefix. session_type is resolved into session_keys by resolve_scope().
+    """
+    year: Optional[str] = None
+    meeting_key: Optional[str] = None
+    session_keys: Optional[List[str]] = None
+    session_type: Optional[str] = None
+    driver_number: Optional[str] = None
+    # Resolved (year, meeting_key, session_key) triples, set by resolve_scope()
+    sessions: Optional[List[Tuple[str, str, str]]] = None
+
+    def is_empty(self) -> bool:
+        """True when no filter is set and the whole table is in scope"""
+        return not any([self.year, self.meeting_key, self.session_keys,
+                        self.session_type, self.driver_number])
+
+    def row_prefixes(self, include_driver: bool = True) -> List[Optional[str]]:
+        """
+        Row-key prefixes covering the scope
+
+        Args:
+            include_driver (bool): Append the driver component when the
+                session is known. Disabled for tables whose keys end at the driver.
+
+        Returns:
+            List[Optional[str]]: Prefixes to scan, [None] for a full table scan
+        """
+        if self.sessions is not None:
+            prefixes = [f"{year}#{meeting}#{session}#" for year, meeting, session in self.sessions]
+            if include_driver and self.driver_number is not None:
+                prefixes = [f"{prefix}{self.driver_number}#" for prefix in prefixes]
+            return prefixes
+        if self.year is None:
+            return [None]
+        if self.meeting_key is None:
+            return [f"{self.year}#"]
+        return [f"{self.year}#{self.meeting_key}#"]
+
+    def matches(self, row_key: str) -> bool:
+        """Check a row key against every filter of the scope"""
+        parts = row_key.split('#')
+        expected = [
+            (0, self.year),
+            (1, self.meeting_key),
+            (3, self.driver_number)
+        ]
+        for index, value in expected:
+            if value is not None and (len(parts) <= index or parts[index] != str(value)):
+                return False
+        if self.session_keys is not None or self.sessions is not None:
+            allowed = set(self.session_keys or []) | {session for _, _, session in self.sessions or []}
+            if len(parts) <= 2 or parts[2] not in allowed:
+                return False
+        return True
+
+    def to_filter(self) -> Optional[Column]:
+        """Column predicate on the partition columns of a Parquet snapshot"""
+        condition = None
+        for name, value in [('year', self.year), ('meeting_key', self.meeting_key),
+                            ('driver_number', self.driver_number)]:
+            if value is not None:
+                clause = col(name) == lit(str(value))
+                condition = clause if condition is None else condition & clause
+        session_keys = self.session_keys
+        if self.sessions is not None:
+            session_keys = [session for _, _, session in self.sessions]
+        if session_keys is not None:
+            clause = col("session_key").isin([str(key) for key in session_keys])
+            condition = clause if condition is None else condition & clause
+        return condition
+
+def resolve_scope(scope: AnalysisScope, connection=None, spark=None,
+                  snapshot_path: Optional[str] = None) -> AnalysisScope:
+    """
+    Resolve session keys and session type into full session prefixes
+
+    Sessions are looked up in the f1_index and f1_summary tables (or the
+    session family of a Parquet snapshot) rather than by scanning f1_data.
+    """
+    if scope.session_keys is None and scope.session_type is None:
+        return scope
+
+    candidates = []
+    if snapshot_path:
+        sessions_df = spark.read.parquet(f"{snapshot_path}/f1_data/session")
+        for name, value in [('year', scope.year), ('meeting_key', scope.meeting_key)]:
+            if value is not None:
+                sessions_df = sessions_df.filter(col(name) == lit(str(value)))
+        for row in sessions_df.select("year", "meeting_key", "session_key", "session_type").collect():
+            candidates.append((str(row.year), str(row.meeting_key), str(row.session_key), row.session_type))
+    elif scope.session_type is None:
+        # Session keys only: one f1_index row get per session
+        index = connection.table('f1_index')
+        for key, value in index.rows([str(session).encode() for session in scope.session_keys],
+                                     columns=['session:prefix']):
+            year, meeting, session = value[b'session:prefix'].decode('utf-8').split('#')
+            candidates.append((year, meeting, session, None))
+    else:
+        summary = connection.table('f1_summary')
+        seen = set()
+        prefix = AnalysisScope(year=scope.year, meeting_key=scope.meeting_key).row_prefixes()[0]
+        for key, value in summary.scan(row_prefix=prefix.encode() if prefix else None,
+                                       columns=['rollup:session_type']):
+            year, meeting, session = key.decode('utf-8').split('#')[:3]
+            if (year, meeting, session) not in seen:
+                seen.add((year, meeting, session))
+                session_type = value.get(b'rollup:session_type', b'').decode('utf-8')
+                candidates.append((year, meeting, session, session_type))
+
+    scope.sessions = [
+        (year, meeting, session)
+        for year, meeting, session, session_type in candidates
+        if (scope.year is None or year == str(scope.year)) and
+           (scope.meeting_key is None or meeting == str(scope.meeting_key)) and
+           (scope.session_keys is None or session in scope.session_keys) and
+           (scope.session_type is None or (session_type or '').lower() == scope.session_type.lower())
+    ]
+    if not scope.sessions:
+        raise ValueError(f"No sessions match scope {scope}")
+    logging.info(f"Scope resolved to {len(scope.sessions)} sessions")
+    return scope
+
+def collect_stage_metrics(spark) -> Dict[str, int]:
+    """
+    Sum I/O and shuffle metrics over all completed stages of the application
+
+    Reads the Spark UI REST API of the running driver, so the numbers are
+    cumulative; diff two calls to attribute them to a piece of work.
+    """
+    totals = {
+        'stages': 0,
+        'input_bytes': 0,
+        'shuffle_read_bytes': 0,
+        'shuffle_write_bytes': 0,
+        'memory_spilled_bytes': 0,
+        'disk_spilled_bytes': 0
+    }
+    ui_url = spark.sparkContext.uiWebUrl
+    if not ui_url:
+        return totals
+    url = f"{ui_url}/api/v1/applications/{spark.sparkContext.applicationId}/stages?status=complete"
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            stages = json.loads(response.read().decode('utf-8'))
+    except Exception as e:
+        logging.warning(f"Could not read stage metrics: {str(e)}")
+        return totals
+    for stage in stages:
+        totals['stages'] += 1
+        totals['input_bytes'] += stage.get('inputBytes', 0)
+        totals['shuffle_read_bytes'] += stage.get('shuffleReadBytes', 0)
+        totals['shuffle_write_bytes'] += stage.get('shuffleWriteBytes', 0)
+        totals['memory_spilled_bytes'] += stage.get('memoryBytesSpilled', 0)
+        totals['disk_spilled_bytes'] += stage.get('diskBytesSpilled', 0)
+    return totals
+
+class RunProfiler:
+    """
+    Per-stage profile of one run, written as JSON by --profile
+
+    Each stage records its wall time and, when Spark is up, the I/O and
+    shuffle metrics of the Spark stages completed meanwhile. Callers add row
+    and byte counts to the yielded record. A disabled profiler records nothing.
+    """
+
+    def __init__(self, enabled: bool = False, spark=None):
+        self.enabled = enabled
+        self.spark = spark
+        self.started = time.perf_counter()
+        self.run: Dict[str, Any] = {'started': datetime.now().isoformat()}
+        self.stages: List[Dict[str, Any]] = []
+        self.plans: Dict[str, str] = {}
+
+    @contextmanager
+    def stage(self, kind: str, name: str):
+        """Profile a block of work, e.g. kind='scan', name='f1_data:car'"""
+        record: Dict[str, Any] = {'kind': kind, 'name': name}
+        if not self.enabled:
+            yield record
+            return
+        before = collect_stage_metrics(self.spark) if self.spark else None
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = builtins.round(time.perf_counter() - started, 4)
+            if before is not None:
+                after = collect_stage_metrics(self.spark)
+                record['spark'] = {key: after[key] - before[key] for key in after}
+            self.stages.append(record)
+
+    def capture_plan(self, name: str, df: DataFrame):
+        """Keep the physical plan Spark chose for a DataFrame"""
+        if self.enabled:
+            self.plans[name] = df._jdf.queryExecution().executedPlan().toString()
+
+    def write(self, output_dir: str) -> Optional[str]:
+        """Write the profile to {output_dir}/spark_profile_{timestamp}.json"""
+        if not self.enabled:
+            return None
+        totals: Dict[str, float] = OrderedDict()
+        for record in self.stages:
+            totals[record['kind']] = builtins.round(totals.get(record['kind'], 0) + record['seconds'], 4)
+        self.run['seconds'] = builtins.round(time.perf_counter() - self.started, 4)
+        if self.spark:
+            self.run['application_id'] = self.spark.sparkContext.applicationId
+            self.run['spark'] = collect_stage_metrics(self.spark)
+
+        os.makedirs(output_dir, exist_ok=True)
+        output_file = f"{output_dir}/spark_profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(output_file, 'w') as f:
+            json.dump({
+                'run': self.run,
+                'seconds_by_kind': totals,
+                'stages': self.stages,
+                'plans': self.plans
+            }, f, indent=2, default=str)
+        logging.info(f"Saved run profile to {output_file}")
+        return output_file
+
+def payload_bytes(data: List[Dict[str, str]]) -> int:
+    """Size of scanned qualifiers and values, as moved from HBase to the driver"""
+    return builtins.sum(len(qualifier) + len(value) for row in data for qualifier, value in row.items())
+
+def fetch_data_from_hbase(connection, table_name, column_family, scope: Optional[AnalysisScope] = None):
+    """
+    Fetch data from HBase and convert to list of dictionaries
+
+    Only the requested column family is read, and a scope turns the scan
+    into one bounded prefix scan per year, meeting or session.
+    """
     table = connection.table(table_name)
     data = []
+    include_driver = table_name not in DRIVER_TERMINATED_TABLES
+    prefixes = scope.row_prefixes(include_driver) if scope else [None]
     
-    for key, value in table.scan():
-        row_data = {}
-        for col, val in value.items():
-            cf, qualifier = col.decode('utf-8').split(':')
-            if cf == column_family:
-                row_data[qualifier] = val.decode('utf-8')
-        if row_data:
-            row_data['row_key'] = key.decode('utf-8')
-            data.append(row_data)
+    for prefix in prefixes:
+        for key, value in table.scan(row_prefix=prefix.encode() if prefix else None,
+                                     columns=[column_family]):
+            row_key = key.decode('utf-8')
+            if scope and not scope.matches(row_key):
+                continue
+            row_data = {}
+            for col, val in value.items():
+                cf, qualifier = col.decode('utf-8').split(':')
+                # The ingester's content fingerprint is not a data column
+                if cf == column_family and qualifier != FINGERPRINT_QUALIFIER:
+                    row_data[qualifier] = val.decode('utf-8')
+            if row_data:
+                row_data['row_key'] = row_key
+                data.append(row_data)
     
     return data
 
+def with_key_columns(df: DataFrame) -> DataFrame:
+    """Add year, meeting_key and session_key columns parsed from row_key"""
+    parts = split(col("row_key"), "#")
+    return (df
+        .withColumn("year", parts.getItem(0))
+        .withColumn("meeting_key", parts.getItem(1))
+        .withColumn("session_key", parts.getItem(2)))
+
+def load_snapshot(spark, snapshot_path: str, table: str, column_family: str,
+                  scope: Optional[AnalysisScope] = None) -> DataFrame:
+    """
+    Load one column family from a Parquet snapshot
+
+    The snapshot is partitioned by year, meeting_key and session_key, so the
+    scope predicate prunes whole directories and driver_number is pushed
+    down to the Parquet reader.
+    """
+    df = spark.read.parquet(f"{snapshot_path}/{table}/{column_family}")
+    condition = scope.to_filter() if scope else None
+    if condition is not None:
+        df = df.filter(condition)
+    return df
+
+def write_parquet_snapshot(spark, connection, snapshot_path: str,
+                           sources: List[Tuple[str, str]],
+                           scope: Optional[AnalysisScope] = None):
+    """
+    Export column families from HBase to a partitioned Parquet snapshot
+
+    Layout: {snapshot_path}/{table}/{column_family}/year=/meeting_key=/session_key=/
+    Only the partitions present in the export are overwritten.
+    """
+    for table, column_family in sources:
+        data = fetch_data_from_hbase(connection, table, column_family, scope)
+        if not data:
+            logging.info(f"No {table}:{column_family} rows to snapshot")
+            continue
+        (with_key_columns(spark.createDataFrame(data))
+            .write
+            .mode("overwrite")
+            .option("partitionOverwriteMode", "dynamic")
+            .partitionBy("year", "meeting_key", "session_key")
+            .parquet(f"{snapshot_path}/{table}/{column_family}"))
+        logging.info(f"Snapshot {table}:{column_family} written to {snapshot_path}")
+
+@dataclass
+class Metric:
+    """
+    Declarative aggregation computed over one HBase column family
+
+    Each aggregate is (alias, agg_fn, expr). When agg_fn is None, expr must
+    already be an aggregate expression and is used as-is, ignoring condition.
+    """
+    name: str
+    source: str
+    aggregates: List[Tuple[str, Optional[Callable[[Column], Column]], Column]]
+    group_by: Tuple[str, ...] = ("driver_number",)
+    condition: Optional[Column] = None
+    order_by: Tuple[Column, ...] = ()
+    table: str = 'f1_data'
+
+class AnalysisPlanner:
+    """Runs declared metrics as one fused aggregation per source DataFrame"""
+
+    def __init__(self, spark, connection, scope: Optional[AnalysisScope] = None,
+                 snapshot_path: Optional[str] = None, profiler: Optional[RunProfiler] = None,
+                 persist: bool = True):
+        """
+        Initialize the planner
+
+        Args:
+            spark (SparkSession): Active Spark session
+            connection (happybase.Connection): HBase connection
+            scope (AnalysisScope, optional): Rows to analyze, whole table if omitted
+            snapshot_path (str, optional): Read sources from this Parquet snapshot instead of HBase
+            profiler (RunProfiler, optional): Record scan, createDataFrame and aggregation stages
+            persist (bool): Cache shared sources and fused results until release().
+                Callers that hand out the lazy results without releasing pass False.
+        """
+        self.spark = spark
+        self.connection = connection
+        self.scope = scope
+        self.snapshot_path = snapshot_path
+        self.profiler = profiler or RunProfiler()
+        self.persist = persist
+        self.metrics: List[Metric] = []
+        self._sources: Dict[Tuple[str, str], DataFrame] = {}
+        self._persisted: List[DataFrame] = []
+        self._cached_sources = set()
+
+    def add(self, *metrics: Metric) -> 'AnalysisPlanner':
+        """Register metrics to be computed by the next execute() call"""
+        self.metrics.extend(metrics)
+        return self
+
+    def load_source(self, table: str, column_family: str) -> Optional[DataFrame]:
+        """Load a column family once and reuse it across passes, None when no rows are in scope"""
+        source = (table, column_family)
+        if source not in self._sources:
+            name = f"{table}:{column_family}"
+            if self.snapshot_path:
+                with self.profiler.stage('load_snapshot', name):
+                    df = load_snapshot(self.spark, self.snapshot_path, table, column_family, self.scope)
+            else:
+                with self.profiler.stage('scan', name) as record:
+                    data = fetch_data_from_hbase(self.connection, table, column_family, self.scope)
+                    record['rows'] = len(data)
+                if self.profiler.enabled:
+                    record['bytes'] = payload_bytes(data)
+                # Scoped runs often select nothing, e.g. a driver without pit
+                # stops, and createDataFrame cannot infer a schema from no rows
+                if not data:
+                    self._sources[source] = None
+                    return None
+                with self.profiler.stage('create_dataframe', name):
+                    df = self.spark.createDataFrame(data)
+            self._sources[source] = df
+        return self._sources[source]
+
+    def _persist(self, df: DataFrame) -> DataFrame:
+        """Persist a DataFrame and remember it for release()"""
+        if not self.persist:
+            return df
+        df = df.persist(StorageLevel.MEMORY_AND_DISK)
+        self._persisted.append(df)
+        return df
+
+    def execute(self) -> Dict[str, DataFrame]:
+        """
+        Compute all registered metrics
+
+        Metrics sharing a source and grouping keys are folded into a single
+        groupBy, so each source is scanned and shuffled once per grouping.
+        Per-metric filters become conditional aggregates instead of separate
+        filtered passes.
+
+        Returns:
+            Dict[str, DataFrame]: Metric name to result DataFrame, in registration order.
+            Metrics whose source has no rows in scope are left out.
+        """
+        groups: Dict[Tuple[Tuple[str, str], Tuple[str, ...]], List[Metric]] = OrderedDict()
+        for metric in self.metrics:
+            source = (metric.table, metric.source)
+            groups.setdefault((source, metric.group_by), []).append(metric)
+
+        passes_per_source: Dict[Tuple[str, str], int] = {}
+        for source, _ in groups:
+            passes_per_source[source] = passes_per_source.get(source, 0) + 1
+
+        results = {}
+        for (source, group_by), metrics in groups.items():
+            df = self.load_source(*source)
+            if df is None:
+                logging.info(f"No {source[0]}:{source[1]} rows in scope, skipping "
+                             f"{', '.join(metric.name for metric in metrics)}")
+                continue
+            # Only cache the raw input when several groupings read it
+            if passes_per_source[source] > 1 and source not in self._cached_sources:
+                df = self._sources[source] = self._persist(df)
+                self._cached_sources.add(source)
+
+            agg_exprs = []
+            for metric in metrics:
+                condition = metric.condition
+                matched = lit(1) if condition is None else when(condition, lit(1))
+                agg_exprs.append(count(matched).alias(f"_rows_{metric.name}"))
+                for alias, agg_fn, expr in metric.aggregates:
+                    if agg_fn is None:
+                        agg_exprs.append(expr.alias(f"{metric.name}__{alias}"))
+                        continue
+                    value = expr if condition is None else when(condition, expr)
+                    agg_exprs.append(agg_fn(value).alias(f"{metric.name}__{alias}"))
+
+            fused = df.groupBy(*group_by).agg(*agg_exprs)
+            name = f"{source[0]}:{source[1]} by {', '.join(group_by)}"
+            self.profiler.capture_plan(name, fused)
+            # The fused result is tiny and feeds every metric of the group.
+            # When profiling, it is also materialized here so the aggregation
+            # is timed apart from toPandas.
+            if len(metrics) > 1 or self.profiler.enabled:
+                fused = self._persist(fused)
+            if self.profiler.enabled:
+                with self.profiler.stage('aggregate', name) as record:
+                    record['metrics'] = [metric.name for metric in metrics]
+                    record['rows'] = fused.count()
+
+            for metric in metrics:
+                result = (fused
+                    .filter(col(f"_rows_{metric.name}") > 0)
+                    .select(*group_by, *[
+                        col(f"{metric.name}__{alias}").alias(alias)
+                        for alias, _, _ in metric.aggregates
+                    ]))
+                if metric.order_by:
+                    result = result.orderBy(*metric.order_by)
+                results[metric.name] = result
+
+        return results
+
+    def release(self):
+        """Unpersist every DataFrame cached by this planner"""
+        for df in self._persisted:
+            df.unpersist()
+        self._persisted = []
+        self._cached_sources = set()
+
+def numeric(name: str) -> Column:
+    """
+    Raw HBase cell as a double, null when missing
+
+    Cells load as strings, which min and max would compare as text, and the
+    ingester stores missing API values as the literal 'None'.
+    """
+    return when(col(name) != "None", col(name)).cast("double")
+
+def driver_performance_metrics() -> List[Metric]:
+    """Lap time and sector metrics over the laps column family"""
+    return [
+        Metric(
+            name='lap_times',
+            source='laps',
+            condition=numeric("lap_duration").isNotNull(),
+            aggregates=[
+                ("avg_lap_time", avg, numeric("lap_duration")),
+                ("best_lap_time", min, numeric("lap_duration")),
+                ("total_laps", count, numeric("lap_number"))
+            ],
+            order_by=(col("avg_lap_time"),)
+        ),
+        Metric(
+            name='sector_performance',
+            source='laps',
+            condition=(
+                numeric("duration_sector_1").isNotNull() &
+                numeric("duration_sector_2").isNotNull() &
+                numeric("duration_sector_3").isNotNull()
+            ),
+            aggregates=[
+                ("avg_sector1", avg, numeric("duration_sector_1")),
+                ("avg_sector2", avg, numeric("duration_sector_2")),
+                ("avg_sector3", avg, numeric("duration_sector_3"))
+            ]
+        )
+    ]
+
+def telemetry_metrics() -> List[Metric]:
+    """Speed and DRS metrics over the car column family"""
+    return [
+        Metric(
+            name='speed_analysis',
+            source='car',
+            condition=numeric("speed").isNotNull(),
+            aggregates=[
+                ("top_speed", max, numeric("speed")),
+                ("avg_speed", avg, numeric("speed"))
+            ],
+            order_by=(desc("top_speed"),)
+        ),
+        Metric(
+            name='drs_usage',
+            source='car',
+            condition=numeric("drs").isNotNull(),
+            aggregates=[
+                ("drs_activations", sum,
+                 when(numeric("drs").isin([10, 12, 14]), 1).otherwise(0))
+            ],
+            order_by=(desc("drs_activations"),)
+        )
+    ]
+
+def pit_stop_metrics() -> List[Metric]:
+    """Pit stop duration metrics over the pit column family"""
+    return [
+        Metric(
+            name='pit_stops',
+            source='pit',
+            condition=numeric("pit_duration").isNotNull(),
+            aggregates=[
+                ("avg_pit_time", avg, numeric("pit_duration")),
+                ("fastest_pit", min, numeric("pit_duration")),
+                ("slowest_pit", max, numeric("pit_duration")),
+                ("pit_stops", count, numeric("pit_duration"))
+            ],
+            order_by=(col("avg_pit_time"),)
+        )
+    ]
+
+def race_progress_metrics() -> List[Metric]:
+    """Position metrics over the position column family"""
+    return [
+        Metric(
+            name='position_changes',
+            source='position',
+            aggregates=[
+                ("laps_led", count, when(col("position") == 1, 1)),
+                ("avg_position", avg, col("position"))
+            ],
+            order_by=(col("avg_position"),)
+        )
+    ]
+
+def tyre_strategy_metrics() -> List[Metric]:
+    """Stint length metrics over the stints column family"""
+    return [
+        Metric(
+            name='tyre_strategy',
+            source='stints',
+            group_by=("driver_number", "compound"),
+            aggregates=[
+                ("avg_stint_length", avg, col("lap_end") - col("lap_start")),
+                ("number_of_stints", count, col("stint_number"))
+            ],
+            order_by=(col("driver_number"), col("compound"))
+        )
+    ]
+
+def rollup_mean(name: str) -> Column:
+    """Weighted mean of a rolled-up field across summary rows"""
+    return sum(col(f"{name}_sum").cast("double")) / sum(col(f"{name}_count").cast("double"))
+
+def rollup_metrics() -> List[Metric]:
+    """
+    Lap, sector, speed, DRS and pit metrics answered from the ingest-time
+    rollups in f1_summary instead of raw f1_data rows
+    """
+    return [
+        Metric(
+            name='lap_times',
+            source='rollup',
+            table='f1_summary',
+            condition=col("lap_duration_count").cast("long") > 0,
+            aggregates=[
+                ("avg_lap_time", None, rollup_mean("lap_duration")),
+                ("best_lap_time", min, col("lap_duration_min").cast("double")),
+                ("total_laps", sum, col("lap_duration_count").cast("long"))
+            ],
+            order_by=(col("avg_lap_time"),)
+        ),
+        Metric(
+            name='sector_performance',
+            source='rollup',
+            table='f1_summary',
+            condition=col("duration_sector_1_count").cast("long") > 0,
+            aggregates=[
+                ("avg_sector1", None, rollup_mean("duration_sector_1")),
+                ("avg_sector2", None, rollup_mean("duration_sector_2")),
+                ("avg_sector3", None, rollup_mean("duration_sector_3"))
+            ]
+        ),
+        Metric(
+            name='speed_analysis',
+            source='rollup',
+            table='f1_summary',
+            condition=col("speed_count").cast("long") > 0,
+            aggregates=[
+                ("top_speed", max, col("speed_max").cast("double")),
+                ("avg_speed", None, rollup_mean("speed"))
+            ],
+            order_by=(desc("top_speed"),)
+        ),
+        Metric(
+            name='drs_usage',
+            source='rollup',
+            table='f1_summary',
+            condition=col("drs_samples").cast("long") > 0,
+            aggregates=[
+                ("drs_activations", sum, col("drs_activations").cast("long"))
+            ],
+            order_by=(desc("drs_activations"),)
+        ),
+        Metric(
+            name='pit_stops',
+            source='rollup',
+            table='f1_summary',
+            condition=col("pit_duration_count").cast("long") > 0,
+            aggregates=[
+                ("avg_pit_time", None, rollup_mean("pit_duration")),
+                ("fastest_pit", min, col("pit_duration_min").cast("double")),
+                ("slowest_pit", max, col("pit_duration_max").cast("double")),
+                ("pit_stops", sum, col("pit_duration_count").cast("long"))
+            ],
+            order_by=(col("avg_pit_time"),)
+        )
+    ]
+
+def pyramid_telemetry_metrics(level: str) -> List[Metric]:
+    """
+    Speed and DRS metrics over a downsampled telemetry level instead of raw
+    car samples. Bucket counts, sums, maxima and DRS counters merge exactly,
+    so every level gives the raw results.
+    """
+    return [
+        Metric(
+            name='speed_analysis',
+            source=level,
+            condition=col("speed_count").cast("long") > 0,
+            aggregates=[
+                ("top_speed", max, col("speed_max").cast("double")),
+                ("avg_speed", None, rollup_mean("speed"))
+            ],
+            order_by=(desc("top_speed"),)
+        ),
+        Metric(
+            name='drs_usage',
+            source=level,
+            condition=col("drs_samples").cast("long") > 0,
+            aggregates=[
+                ("drs_activations", sum, col("drs_activations").cast("long"))
+            ],
+            order_by=(desc("drs_activations"),)
+        )
+    ]
+
+SKETCH_CHANNELS = ('speed', 'rpm', 'throttle', 'samples')
+
+def collect_sketch_rows(connection, scope: Optional[AnalysisScope] = None,
+                        fractions=(0.5, 0.9, 0.99)) -> List[Dict[str, Any]]:
+    """
+    Merge the ingest-time sketches in f1_summary into one row per driver
+
+    Sketches are merged on the driver, so the cost depends on the number of
+    sessions and drivers, not on the number of telemetry samples.
+    """
+    table = connection.table('f1_summary')
+    payloads: Dict[str, Dict[str, List[str]]] = {}
+
+    prefixes = scope.row_prefixes(include_driver=False) if scope else [None]
+    for key, value in (item for prefix in prefixes
+                       for item in table.scan(row_prefix=prefix.encode() if prefix else None,
+                                              columns=['sketch'])):
+        if scope and not scope.matches(key.decode('utf-8')):
+            continue
+        driver_number = key.decode('utf-8').split('#')[-1]
+        driver_payloads = payloads.setdefault(driver_number, {})
+        for column, payload in value.items():
+            channel = column.decode('utf-8').split(':')[1]
+            driver_payloads.setdefault(channel, []).append(payload.decode('utf-8'))
+
+    rows = []
+    for driver_number, channels in payloads.items():
+        merged = {
+            channel: merge_sketches(channels[channel])
+            for channel in SKETCH_CHANNELS if channel in channels
+        }
+        row = {'driver_number': driver_number}
+        row.update(summarize_sketches(merged, fractions))
+        rows.append(row)
+
+    return rows
+
+def sketch_schema(fractions=(0.5, 0.9, 0.99)) -> StructType:
+    """Columns of collect_sketch_rows(), including channels a driver has no sketch for"""
+    fields = [StructField('driver_number', StringType())]
+    for channel in SKETCH_CHANNELS:
+        if channel == 'samples':
+            fields.append(StructField(f"{channel}_distinct", LongType()))
+            continue
+        fields.extend(StructField(f"{channel}_p{int(builtins.round(fraction * 100))}", DoubleType())
+                      for fraction in fractions)
+        fields.append(StructField(f"{channel}_min", DoubleType()))
+        fields.append(StructField(f"{channel}_max", DoubleType()))
+    return StructType(fields)
+
+def analyze_telemetry_sketches(spark, connection, scope: Optional[AnalysisScope] = None,
+                               fractions=(0.5, 0.9, 0.99)):
+    """Approximate telemetry distributions per driver from f1_summary sketches"""
+    logging.info("Starting approximate telemetry analysis")
+    rows = collect_sketch_rows(connection, scope, fractions)
+    # A fixed schema keeps empty scopes and all-None columns (empty sketches) valid
+    schema = sketch_schema(fractions)
+    values = [
+        tuple(
+            float(row[field.name])
+            if isinstance(field.dataType, DoubleType) and row.get(field.name) is not None
+            else row.get(field.name)
+            for field in schema.fields
+        )
+        for row in rows
+    ]
+    top_quantile = f"speed_p{int(builtins.round(builtins.max(fractions) * 100))}"
+    return spark.createDataFrame(values, schema).orderBy(desc_nulls_last(top_quantile))
+
+# The analyze_* wrappers return None for a metric whose source has no rows
+
 def analyze_driver_performance(spark, connection):
     """Analyze driver performance statistics"""
     logging.info("Starting driver performance analysis")
-    
-    # Fetch lap data
-    lap_data = fetch_data_from_hbase(connection, 'f1_data', 'laps')
-    lap_df = spark.createDataFrame(lap_data)
-    
-    # Calculate average lap times per driver
-    avg_lap_times = (lap_df
-        .filter(col("lap_duration").isNotNull())
-        .groupBy("driver_number")
-        .agg(
-            avg("lap_duration").alias("avg_lap_time"),
-            min("lap_duration").alias("best_lap_time"),
-            count("lap_number").alias("total_laps")
-        )
-        .orderBy("avg_lap_time"))
-    
-    # Sector performance analysis
-    sector_performance = (lap_df
-        .filter(
-            col("duration_sector_1").isNotNull() &
-            col("duration_sector_2").isNotNull() &
-            col("duration_sector_3").isNotNull()
-        )
-        .groupBy("driver_number")
-        .agg(
-            avg("duration_sector_1").alias("avg_sector1"),
-            avg("duration_sector_2").alias("avg_sector2"),
-            avg("duration_sector_3").alias("avg_sector3")
-        ))
-    
-    return avg_lap_times, sector_performance
+    results = AnalysisPlanner(spark, connection, persist=False).add(*driver_performance_metrics()).execute()
+    return results.get('lap_times'), results.get('sector_performance')
 
 def analyze_telemetry_data(spark, connection):
     """Analyze car telemetry data"""
     logging.info("Starting telemetry data analysis")
-    
-    # Fetch car data
-    car_data = fetch_data_from_hbase(connection, 'f1_data', 'car')
-    car_df = spark.createDataFrame(car_data)
-    
-    # Speed analysis
-    speed_analysis = (car_df
-        .filter(col("speed").isNotNull())
-        .groupBy("driver_number")
-        .agg(
-            max("speed").alias("top_speed"),
-            avg("speed").alias("avg_speed")
-        )
-        .orderBy(desc("top_speed")))
-    
-    # DRS usage analysis
-    drs_usage = (car_df
-        .filter(col("drs").isNotNull())
-        .groupBy("driver_number")
-        .agg(
-            sum(when(col("drs").isin([10, 12, 14]), 1)
-                .otherwise(0)).alias("drs_activations")
-        )
-        .orderBy(desc("drs_activations")))
-    
-    return speed_analysis, drs_usage
+    results = AnalysisPlanner(spark, connection, persist=False).add(*telemetry_metrics()).execute()
+    return results.get('speed_analysis'), results.get('drs_usage')
+
+def analyze_telemetry_pyramid(spark, connection, resolution: Optional[float] = COARSEST_RESOLUTION):
+    """Analyze car telemetry from the coarsest pyramid level fitting resolution"""
+    level = pick_level(resolution)
+    if level is None:
+        return analyze_telemetry_data(spark, connection)
+    logging.info(f"Starting telemetry data analysis on {level}")
+    results = AnalysisPlanner(spark, connection, persist=False).add(*pyramid_telemetry_metrics(level)).execute()
+    return results.get('speed_analysis'), results.get('drs_usage')
 
 def analyze_pit_stops(spark, connection):
     """Analyze pit stop performance"""
     logging.info("Starting pit stop analysis")
-    
-    # Fetch pit stop data
-    pit_data = fetch_data_from_hbase(connection, 'f1_data', 'pit')
-    pit_df = spark.createDataFrame(pit_data)
-    
-    # Pit stop analysis
-    pit_analysis = (pit_df
-        .filter(col("pit_duration").isNotNull())
-        .groupBy("driver_number")
-        .agg(
-            avg("pit_duration").alias("avg_pit_time"),
-            min("pit_duration").alias("fastest_pit"),
-            max("pit_duration").alias("slowest_pit"),
-            count("pit_duration").alias("pit_stops")
-        )
-        .orderBy("avg_pit_time"))
-    
-    return pit_analysis
+    results = AnalysisPlanner(spark, connection, persist=False).add(*pit_stop_metrics()).execute()
+    return results.get('pit_stops')
 
 def analyze_race_progress(spark, connection):
     """Analyze race progress and positions"""
     logging.info("Starting race progress analysis")
-    
-    # Fetch position data
-    position_data = fetch_data_from_hbase(connection, 'f1_data', 'position')
-    position_df = spark.createDataFrame(position_data)
-    
-    # Position changes analysis
-    position_changes = (position_df
-        .groupBy("driver_number")
-        .agg(
-            count(when(col("position") == 1, 1)).alias("laps_led"),
-            avg("position").alias("avg_position")
-        )
-        .orderBy("avg_position"))
-    
-    return position_changes
+    results = AnalysisPlanner(spark, connection, persist=False).add(*race_progress_metrics()).execute()
+    return results.get('position_changes')
 
 def analyze_tyre_strategy(spark, connection):
     """Analyze tyre usage and strategy"""
     logging.info("Starting tyre strategy analysis")
-    
-    # Fetch stint data
-    stint_data = fetch_data_from_hbase(connection, 'f1_data', 'stints')
-    stint_df = spark.createDataFrame(stint_data)
-    
-    # Tyre usage analysis
-    tyre_analysis = (stint_df
-        .groupBy("driver_number", "compound")
-        .agg(
-            avg(col("lap_end") - col("lap_start")).alias("avg_stint_length"),
-            count("stint_number").alias("number_of_stints")
-        )
-        .orderBy("driver_number", "compound"))
-    
-    return tyre_analysis
+    results = AnalysisPlanner(spark, connection, persist=False).add(*tyre_strategy_metrics()).execute()
+    return results.get('tyre_strategy')
 
-def save_analysis_results(analyses, output_path):
+def save_analysis_results(analyses, output_path, profiler: Optional[RunProfiler] = None):
     """Save analysis results to files"""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    profiler = profiler or RunProfiler()
     
     for name, df in analyses.items():
-        # Convert to Pandas for easier saving
-        pdf = df.toPandas()
+        # Convert to Pandas for easier saving, local engine results already are
+        with profiler.stage('to_pandas', name) as record:
+            pdf = df.toPandas() if hasattr(df, 'toPandas') else df
+            record['rows'] = len(pdf)
+        if profiler.enabled:
+            record['bytes'] = int(pdf.memory_usage(deep=True).sum())
         output_file = f"{output_path}/f1_analysis_{name}_{timestamp}.csv"
-        pdf.to_csv(output_file, index=False)
+        with profiler.stage('write_csv', name):
+            pdf.to_csv(output_file, index=False)
         logging.info(f"Saved {name} analysis to {output_file}")
 
+# Sources exported by --export-snapshot
+SNAPSHOT_SOURCES = [
+    ('f1_data', 'session'),
+    ('f1_data', 'laps'),
+    ('f1_data', 'car'),
+    ('f1_data', 'pit'),
+    ('f1_data', 'position'),
+    ('f1_data', 'stints'),
+    ('f1_summary', 'rollup')
+] + [('f1_data', family) for family in PYRAMID_FAMILIES]
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="F1 data analysis on Spark")
+    parser.add_argument(
+        "--source", choices=["raw", "rollup", "pyramid"], default="raw",
+        help="Compute lap, speed, DRS and pit metrics from raw rows or from f1_summary rollups, "
+             "or speed and DRS metrics from downsampled telemetry"
+    )
+    parser.add_argument(
+        "--resolution", type=float, default=COARSEST_RESOLUTION,
+        help="With --source pyramid, largest bucket width in seconds the telemetry may be read at "
+             "(default: %(default)s, the coarsest level)"
+    )
+    parser.add_argument(
+        "--approx", action="store_true",
+        help="Add speed, RPM and throttle percentiles merged from f1_summary sketches"
+    )
+    parser.add_argument("--year", help="Only analyze this season")
+    parser.add_argument("--meeting", help="Only analyze this meeting_key")
+    parser.add_argument("--session", action="append",
+                        help="Only analyze this session_key (repeatable)")
+    parser.add_argument("--session-type",
+                        help="Only analyze sessions of this type, e.g. Race or Qualifying")
+    parser.add_argument("--driver", help="Only analyze this driver_number")
+    parser.add_argument(
+        "--snapshot",
+        help="Read sources from a Parquet snapshot directory instead of HBase"
+    )
+    parser.add_argument(
+        "--export-snapshot",
+        help="Write the scoped HBase sources to a partitioned Parquet snapshot and exit"
+    )
+    parser.add_argument(
+        "--engine", choices=["auto", "spark", "local"], default="auto",
+        help="auto runs small scopes on the local NumPy engine and the rest on Spark"
+    )
+    parser.add_argument(
+        "--local-max-sessions", type=int, default=1,
+        help="Largest number of sessions the auto engine runs locally"
+    )
+    parser.add_argument(
+        "--output", default="/user/hadoop/f1_analysis",
+        help="Directory for the CSV results"
+    )
+    parser.add_argument(
+        "--profile",
+        help="Write a per-stage JSON profile of the run (timings, rows, bytes, "
+             "Spark metrics and physical plans) to this directory"
+    )
+    return parser.parse_args()
+
+def choose_engine(args, scope: AnalysisScope) -> str:
+    """
+    Pick the engine for a run
+
+    The local engine only covers raw HBase sources, so rollup, snapshot and
+    export runs always go to Spark. In auto mode, scopes resolved to at most
+    --local-max-sessions sessions run locally.
+    """
+    if args.engine == "spark" or args.snapshot or args.export_snapshot or args.source != "raw":
+        return "spark"
+    if args.engine == "local":
+        return "local"
+    if scope.sessions is not None and len(scope.sessions) <= args.local_max_sessions:
+        return "local"
+    return "spark"
+
 def main():
     """Main execution function"""
+    args = parse_args()
+    spark = None
+    planner = None
+    profiler = RunProfiler(enabled=bool(args.profile))
+    profiler.run['args'] = vars(args)
     try:
-        # Initialize Spark session
-        spark = create_spark_session()
+        # Connect to HBase unless everything is read from a snapshot
+        connection = None
+        if not args.snapshot or args.approx:
+            connection = happybase.Connection('localhost')
         
-        # Connect to HBase
-        connection = happybase.Connection('localhost')
+        # Snapshot scopes are resolved from Parquet, which needs Spark up front
+        if args.snapshot:
+            spark = profiler.spark = create_spark_session()
         
-        # Perform analyses
-        analyses = {}
+        with profiler.stage('resolve_scope', 'scope'):
+            scope = resolve_scope(AnalysisScope(
+                year=args.year,
+                meeting_key=args.meeting,
+                session_keys=args.session,
+                session_type=args.session_type,
+                driver_number=args.driver
+            ), connection, spark, args.snapshot)
         
-        # Driver Performance
-        avg_lap_times, sector_performance = analyze_driver_performance(spark, connection)
-        analyses['lap_times'] = avg_lap_times
-        analyses['sector_performance'] = sector_performance
+        engine = choose_engine(args, scope)
+        logging.info(f"Running analyses on the {engine} engine")
+        profiler.run['engine'] = engine
+        profiler.run['sessions'] = len(scope.sessions) if scope.sessions is not None else None
         
-        # Telemetry Analysis
-        speed_analysis, drs_usage = analyze_telemetry_data(spark, connection)
-        analyses['speed_analysis'] = speed_analysis
-        analyses['drs_usage'] = drs_usage
+        if engine == "local":
+            # Imported here so Spark runs need neither NumPy nor f1_local_engine.py
+            import pandas as pd
+            from f1_local_engine import run_local_analyses
+            with profiler.stage('local', 'run_local_analyses'):
+                analyses = run_local_analyses(connection, scope.row_prefixes(), scope.matches)
+            if args.approx:
+                with profiler.stage('sketches', 'telemetry_distribution'):
+                    analyses['telemetry_distribution'] = pd.DataFrame(
+                        collect_sketch_rows(connection, scope))
+            save_analysis_results(analyses, args.output, profiler)
+            logging.info("Analysis completed successfully")
+            return
         
-        # Pit Stop Analysis
-        pit_analysis = analyze_pit_stops(spark, connection)
-        analyses['pit_stops'] = pit_analysis
+        # Initialize Spark session
+        spark = profiler.spark = spark or create_spark_session()
         
-        # Race Progress
-        position_changes = analyze_race_progress(spark, connection)
-        analyses['position_changes'] = position_changes
+        if args.export_snapshot:
+            with profiler.stage('export_snapshot', args.export_snapshot):
+                write_parquet_snapshot(spark, connection, args.export_snapshot, SNAPSHOT_SOURCES, scope)
+            return
         
-        # Tyre Strategy
-        tyre_analysis = analyze_tyre_strategy(spark, connection)
-        analyses['tyre_strategy'] = tyre_analysis
+        # Register every analysis so shared sources are scanned once
+        planner = AnalysisPlanner(spark, connection, scope, args.snapshot, profiler)
+        if args.source == "rollup":
+            # lap_times, sector_performance, speed_analysis, drs_usage, pit_stops
+            planner.add(*rollup_metrics())
+        else:
+            level = pick_level(args.resolution) if args.source == "pyramid" else None
+            planner.add(
+                *driver_performance_metrics(),   # lap_times, sector_performance
+                # speed_analysis, drs_usage
+                *(pyramid_telemetry_metrics(level) if level else telemetry_metrics()),
+                *pit_stop_metrics()              # pit_stops
+            )
+        planner.add(
+            *race_progress_metrics(),        # position_changes
+            *tyre_strategy_metrics()         # tyre_strategy
+        )
+        analyses = planner.execute()
+        if args.approx:
+            with profiler.stage('sketches', 'telemetry_distribution'):
+                analyses['telemetry_distribution'] = analyze_telemetry_sketches(spark, connection, scope)
         
         # Save results
-        save_analysis_results(analyses, "/user/hadoop/f1_analysis")
+        save_analysis_results(analyses, args.output, profiler)
         
         logging.info("Analysis completed successfully")
         
     except Exception as e:
         logging.error(f"Error during analysis: {str(e)}")
+        profiler.run['error'] = str(e)
         raise
     finally:
-        spark.stop()
+        if args.profile:
+            try:
+                profiler.write(args.profile)
+            except Exception as e:
+                logging.warning(f"Could not write run profile: {str(e)}")
+        if planner:
+            planner.release()
+        if spark:
+            spark.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,51 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("happybase")
+pytest.importorskip("pyspark")
+
+from f1_benchmark import LocalHBaseConnection, SyntheticF1Generator
+from f1_local_engine import run_local_analyses
+from spark_process import (AnalysisPlanner, driver_performance_metrics, pit_stop_metrics,
+                           race_progress_metrics, telemetry_metrics, tyre_strategy_metrics)
+
+@pytest.fixture(scope="module")
+def spark():
+    from pyspark.sql import SparkSession
+    try:
+        session = SparkSession.builder.master("local[1]").appName("f1-tests").getOrCreate()
+    except Exception as e:
+        pytest.skip(f"Spark is not available: {e}")
+    yield session
+    session.stop()
+
+@pytest.fixture(scope="module")
+def connection():
+    connection = LocalHBaseConnection()
+    SyntheticF1Generator(connection, seed=11).generate(sessions=1, drivers=4, duration=1800)
+    return connection
+
+def sorted_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    keys = [name for name in ('driver_number', 'compound') if name in frame.columns]
+    return frame.sort_values(keys).reset_index(drop=True)
+
+def test_local_engine_matches_spark(spark, connection):
+    planner = AnalysisPlanner(spark, connection, persist=False).add(
+        *driver_performance_metrics(), *telemetry_metrics(), *pit_stop_metrics(),
+        *race_progress_metrics(), *tyre_strategy_metrics())
+    spark_results = {name: df.toPandas() for name, df in planner.execute().items()}
+    local_results = run_local_analyses(connection, [None])
+
+    assert set(spark_results) == set(local_results)
+    for name, local in local_results.items():
+        expected = sorted_frame(spark_results[name])
+        actual = sorted_frame(local)
+        assert list(actual.columns) == list(expected.columns), name
+        assert len(actual) == len(expected) > 0, name
+        for column in actual.columns:
+            if column in ('driver_number', 'compound'):
+                assert list(actual[column].astype(str)) == list(expected[column].astype(str)), name
+            else:
+                assert np.allclose(actual[column].astype(float), expected[column].astype(float),
+                                   equal_nan=True), f"{name}.{column}"
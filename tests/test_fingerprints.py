@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("happybase")
+pytest.importorskip("pyspark")
+
+from f1_benchmark import LocalHBaseConnection
+from hbase_populate_openF1 import HBaseConnector
+
+ROW_KEY = '2023#1229#9158#1#None'
+RECORDS = [
+    {'position': 5, 'date': 'd5'},
+    {'position': 4, 'date': 'd4'},
+    {'position': 3, 'date': 'd3'}
+]
+
+def ingest(connection):
+    connector = HBaseConnector(connection=connection)
+    connector.load_fingerprints('f1_data', ['position'], row_keys=[ROW_KEY])
+    written = [connector.store_data('f1_data', ROW_KEY, record, 'position')
+               for record in RECORDS]
+    return connector, written
+
+def stored_record(connection):
+    row = connection.table('f1_data').row(ROW_KEY.encode())
+    return row[b'position:position'], row[b'position:date']
+
+def test_reingest_multi_write_key_keeps_last_record():
+    connection = LocalHBaseConnection()
+    connection.create_table('f1_data', {'position': {}})
+
+    _, written = ingest(connection)
+    assert written == [True, True, True]
+    assert stored_record(connection) == (b'3', b'd3')
+
+    # Each record differs from the one before it, so every write must happen again
+    _, written = ingest(connection)
+    assert written == [True, True, True]
+    assert stored_record(connection) == (b'3', b'd3')
+
+def test_reingest_unchanged_row_is_skipped():
+    connection = LocalHBaseConnection()
+    connection.create_table('f1_data', {'position': {}})
+    connector = HBaseConnector(connection=connection)
+    assert connector.store_data('f1_data', ROW_KEY, RECORDS[0], 'position')
+    # Same run, same content: compared against the fingerprint just written
+    assert not connector.store_data('f1_data', ROW_KEY, RECORDS[0], 'position')
+
+    connector = HBaseConnector(connection=connection)
+    connector.load_fingerprints('f1_data', ['position'], row_keys=[ROW_KEY])
+    assert not connector.store_data('f1_data', ROW_KEY, RECORDS[0], 'position')
+    assert connector.stats.rows_skipped == 1
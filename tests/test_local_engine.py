@@ -0,0 +1,40 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("happybase")
+pytest.importorskip("pyspark")
+
+from f1_benchmark import LocalHBaseConnection, SyntheticF1Generator
+from f1_local_engine import GroupIndex, run_local_analyses
+
+def test_group_index_with_two_key_columns():
+    drivers = np.asarray(['1', '1', '44', '1', '44'], dtype=object)
+    compounds = np.asarray(['SOFT', 'HARD', 'SOFT', 'SOFT', 'SOFT'], dtype=object)
+    group = GroupIndex(drivers, compounds)
+
+    assert group.size == 3
+    assert list(group.keys[0]) == ['1', '1', '44']
+    assert list(group.keys[1]) == ['HARD', 'SOFT', 'SOFT']
+    assert list(group.count(np.ones(5, dtype=bool))) == [1, 2, 2]
+
+def test_tyre_strategy_on_synthetic_session():
+    connection = LocalHBaseConnection()
+    SyntheticF1Generator(connection, seed=7).generate(sessions=1, drivers=3, duration=900)
+
+    result = run_local_analyses(connection, [None], families=['stints'])['tyre_strategy']
+
+    rows = [{qualifier.decode().split(':', 1)[1]: value.decode()
+             for qualifier, value in data.items()}
+            for _, data in connection.table('f1_data').scan(columns=['stints'])]
+    stints = pd.DataFrame(rows)
+    stints['length'] = stints['lap_end'].astype(float) - stints['lap_start'].astype(float)
+    expected = (stints.groupby(['driver_number', 'compound'])
+                .agg(avg_stint_length=('length', 'mean'), number_of_stints=('stint_number', 'count'))
+                .reset_index())
+
+    assert len(result) == len(expected) > 0
+    assert list(result['driver_number']) == list(expected['driver_number'])
+    assert list(result['compound']) == list(expected['compound'])
+    assert np.allclose(result['avg_stint_length'], expected['avg_stint_length'])
+    assert list(result['number_of_stints']) == list(expected['number_of_stints'])